@@ -0,0 +1,80 @@
+"""
+Benchmark: float32 change kernel (previous detect_changes) vs integer-only kernel
+
+For each size, times the kernel and measures peak numpy memory with tracemalloc,
+and checks that both give bit-identical masks.
+Run from ml-services/:
+    python bench_change_detection.py [size ...]      (default: 256 2048 10980)
+A 10980 px pair needs several GB of RAM for the float path.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import contextlib
+import io
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.change_detector import ChangeDetector
+
+sizes = [int(arg) for arg in sys.argv[1:]] or [256, 2048, 10980]
+
+with contextlib.redirect_stdout(io.StringIO()):
+    detector = ChangeDetector(change_threshold=50)
+
+
+def float_kernel(before, after):
+    # what detect_changes did before the integer kernel
+    img1 = before.copy()
+    img2 = after.copy()
+    if img1.max() <= 1.0:
+        img1 = (img1 * 255).astype(np.uint8)
+    if img2.max() <= 1.0:
+        img2 = (img2 * 255).astype(np.uint8)
+    difference = detector._compute_difference(img1, img2)
+    return (difference > detector.change_threshold).astype(np.uint8)
+
+
+def integer_kernel(before, after):
+    img1 = detector._to_uint8_range(before)
+    img2 = detector._to_uint8_range(after)
+    difference_sum, channels = detector._difference_sum(img1, img2)
+    return (difference_sum > channels * detector.change_threshold).astype(np.uint8)
+
+
+def measure(func, before, after):
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        mask = func(before, after)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return mask, seconds, peak
+
+
+print("=" * 78)
+print("📊 CHANGE DETECTION KERNEL BENCHMARK")
+print("=" * 78)
+print(f"{'size':>7s} {'kernel':>8s} {'time':>10s} {'peak memory':>14s}")
+rng = np.random.default_rng(0)
+for size in sizes:
+    before = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+    after = before.copy()
+    after[size // 2:, size // 2:] //= 2  # simulated change in one quadrant
+    noise = rng.integers(0, 40, size=after.shape, dtype=np.uint8)
+    np.add(after, noise, out=after, where=after < 216)
+
+    results = {}
+    for name, func in (("float32", float_kernel), ("integer", integer_kernel)):
+        mask, seconds, peak = measure(func, before, after)
+        results[name] = mask
+        print(f"{size:>7d} {name:>8s} {seconds * 1000:8.1f} ms {peak / 1024 / 1024:11.1f} MB")
+        del mask
+    print(f"{'':>7s} identical masks: {np.array_equal(results['float32'], results['integer'])}")
+    del before, after, noise, results
+print("=" * 78)
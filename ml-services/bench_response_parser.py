@@ -0,0 +1,123 @@
+"""
+Benchmark: per-field keyword scans vs single-pass ResponseParser
+
+Builds a synthetic corpus of Gemini-style responses, checks that the parser
+gives the same fields as the per-field scans VisionAI used before it (kept
+below as the reference) for every record, then times the scans, the parser,
+and the parser's multi-process bulk API.
+Run from ml-services/:
+    python bench_response_parser.py [records] [workers]      (default: 20000 4)
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.response_parser import (
+    ResponseParser, VIOLATION_KEYWORDS, NO_VIOLATION_KEYWORDS, CONFIDENCE_RULES, DEFAULT_CONFIDENCE,
+    SEVERITY_RULES, DEFAULT_SEVERITY, LOCATION_KEYWORDS, DEFAULT_LOCATION,
+    RECOMMENDATION_KEYWORDS, DEFAULT_RECOMMENDATIONS
+)
+
+records = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+SENTENCES = [
+    "Yes, there is evidence of sand mining along the riverbank",
+    "Excavation marks are visible in the northeastern section of the image",
+    "No evidence of illegal construction was found",
+    "The image shows normal, natural land use",
+    "Confidence level: High confidence in this assessment",
+    "I am uncertain about the cause of the bare patches",
+    "Severity: Moderate, the affected area is medium sized",
+    "The damage appears severe and significant",
+    "Only a small, limited area in the lower left is affected",
+    "Vegetation clearing is observed in the central part",
+    "We recommend a field visit to verify the findings",
+    "It is suggested to compare with earlier imagery",
+    "Unauthorized structures are present near the river",
+    "The water body looks unchanged",
+    "Affected area is estimated at 2 hectares",
+    "1. Evidence: Uncertain\n2. Location: upper right corner",
+    "**Assessment**: minor violation of riverside buffer zone",
+    "Natürliche Vegetation ist sichtbar",
+]
+DETECTION_TYPES = ["general", "sand_mining", "land_encroachment", "vegetation"]
+
+
+def reference_parse(text, detection_type):
+    """Per-field scans: every field lowercases and splits the text again"""
+    def first_rule(rules, default):
+        for label, words in rules:
+            if any(w in text.lower() for w in words):
+                return label
+        return default
+
+    violations = None
+    if any(k in text.lower() for k in NO_VIOLATION_KEYWORDS):
+        violations = False
+    elif any(k in text.lower() for k in VIOLATION_KEYWORDS):
+        violations = True
+
+    location = DEFAULT_LOCATION
+    for keyword in LOCATION_KEYWORDS:
+        if keyword in text.lower():
+            location = next(s.strip() for s in text.split('.') if keyword in s.lower())
+            break
+
+    recommendations = [s.strip() for s in text.split('.')
+                       if any(k in s.lower() for k in RECOMMENDATION_KEYWORDS)]
+
+    summary = '. '.join(text.split('.')[:3]).strip()
+    return {
+        "raw_response": text,
+        "detection_type": detection_type,
+        "violations_detected": violations,
+        "summary": summary if summary else text[:200],
+        "confidence": first_rule(CONFIDENCE_RULES, DEFAULT_CONFIDENCE),
+        "severity": first_rule(SEVERITY_RULES, DEFAULT_SEVERITY),
+        "location": location,
+        "recommendations": recommendations or list(DEFAULT_RECOMMENDATIONS)
+    }
+
+
+def synthetic_corpus(n, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        picked = rng.sample(SENTENCES, rng.randint(2, 9))
+        text = ". ".join(s.upper() if rng.random() < 0.1 else s for s in picked)
+        if rng.random() < 0.5:
+            text += "."
+        corpus.append((text, rng.choice(DETECTION_TYPES)))
+    return corpus
+
+
+corpus = synthetic_corpus(records)
+parser = ResponseParser()
+
+print("=" * 70)
+print(f"Re-parsing {records} synthetic responses")
+print("=" * 70)
+
+start = time.perf_counter()
+legacy = [reference_parse(text, t) for text, t in corpus]
+legacy_seconds = time.perf_counter() - start
+
+start = time.perf_counter()
+single = [parser.parse(text, t) for text, t in corpus]
+single_seconds = time.perf_counter() - start
+
+start = time.perf_counter()
+bulk = list(parser.parse_many(iter(corpus), num_workers=workers))
+bulk_seconds = time.perf_counter() - start
+
+mismatches = sum(a != b for a, b in zip(legacy, single)) + sum(a != b for a, b in zip(legacy, bulk))
+print(f"per field scans:           {legacy_seconds:7.2f}s  {records / legacy_seconds:9.0f} records/s")
+print(f"ResponseParser.parse:      {single_seconds:7.2f}s  {records / single_seconds:9.0f} records/s")
+print(f"parse_many ({workers} workers):   {bulk_seconds:7.2f}s  {records / bulk_seconds:9.0f} records/s")
+print(f"Mismatching records: {mismatches}")
+assert mismatches == 0 and len(bulk) == records
@@ -0,0 +1,148 @@
+"""
+Persistent cache of Vision AI responses for SEVAS
+Same image + same prompt + same model = same answer, so repeated analyses
+skip the API round trip and its cost
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class ResponseCache:
+    """
+    SQLite cache of Vision AI responses
+    Keyed by image content hash + prompt hash + model name, stores the raw
+    response text and the parsed analysis dict
+    """
+
+    def __init__(self, db_path, ttl_seconds=7 * 24 * 3600, max_entries=100000):
+        """
+        Initialize cache
+
+        Args:
+            db_path (str): SQLite file (created if missing)
+            ttl_seconds (float): Entries older than this are ignored and removed (None = never expire)
+            max_entries (int): Least recently used entries are evicted above this
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # shared by the sync path and the batch event loop / worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                raw_text TEXT NOT NULL,
+                parsed TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+        print(f"ResponseCache initialized")
+        print(f"   Database: {db_path}")
+        print(f"   TTL: {ttl_seconds}s, max entries: {max_entries}")
+
+    def make_key(self, image_path, prompt, model_name, variant=""):
+        """
+        Build cache key from image content hash + prompt hash + model name
+
+        Args:
+            image_path (str): Image that is sent
+            prompt (str): Full prompt text
+            model_name (str): Model that answers
+            variant (str): Anything else that changes the request (e.g. upload size)
+
+        Returns:
+            str: Key
+        """
+        image_digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                image_digest.update(chunk)
+        prompt_digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        key = f"{model_name}:{image_digest.hexdigest()}:{prompt_digest}"
+        if variant:
+            key += f":{variant}"
+        return key
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Returns:
+            tuple or None: (raw_text, parsed_dict), None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw_text, parsed, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            # mark as recently used for LRU eviction
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, key, raw_text, parsed):
+        """
+        Store a response, then evict old entries if over max_entries
+        """
+        now = time.time()
+        model = key.split(':', 1)[0]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, raw_text, json.dumps(parsed), now, now)
+            )
+            self._conn.commit()
+        self.evict()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """Remove expired entries, then least recently used ones above max_entries"""
+        with self._lock:
+            removed = 0
+            if self.ttl_seconds is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,)
+                ).rowcount
+            self._conn.commit()
+        if removed:
+            print(f"ResponseCache evicted {removed} entries")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,173 @@
+"""
+Parser for Vision AI responses
+Parses every live answer for VisionAI and re-parses archived raw responses in
+bulk (e.g. after a parsing rule changes), with one lowercase/split and one
+lookup per distinct keyword per response
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Parsing rules, VisionAI._parse_gemini_response uses this parser too.
+# Rules are checked in order, the first one with a keyword present wins.
+VIOLATION_KEYWORDS = (
+    "yes", "detected", "evidence", "visible", "observed",
+    "mining", "excavation", "encroachment", "clearing",
+    "unauthorized", "illegal", "violation"
+)
+NO_VIOLATION_KEYWORDS = (
+    "no evidence", "not detected", "no violations",
+    "normal", "natural", "no signs", "unclear"
+)
+CONFIDENCE_RULES = (
+    ("High", ("high confidence", "confident")),
+    ("Medium", ("medium confidence", "moderate")),
+    ("Low", ("low confidence", "uncertain")),
+)
+DEFAULT_CONFIDENCE = "Medium"
+SEVERITY_RULES = (
+    ("Severe", ("severe", "significant", "major")),
+    ("Moderate", ("moderate", "medium")),
+    ("Minor", ("minor", "small", "limited")),
+)
+DEFAULT_SEVERITY = "Unknown"
+LOCATION_KEYWORDS = (
+    "northeastern", "northwestern", "southeastern", "southwestern",
+    "northern", "southern", "eastern", "western",
+    "center", "central", "middle",
+    "riverbank", "riverside", "along the river",
+    "upper", "lower", "left", "right"
+)
+DEFAULT_LOCATION = "Location not specified"
+RECOMMENDATION_KEYWORDS = ("recommend", "suggest")
+DEFAULT_RECOMMENDATIONS = ["Field verification recommended"]
+
+# the parser maps a match to its sentence by counting dots, so no keyword may contain one
+if any('.' in k for k in (VIOLATION_KEYWORDS + NO_VIOLATION_KEYWORDS + LOCATION_KEYWORDS
+                          + RECOMMENDATION_KEYWORDS
+                          + sum((words for _, words in CONFIDENCE_RULES + SEVERITY_RULES), ()))):
+    raise ValueError("Response parsing keywords must not contain '.'")
+
+
+class ResponseParser:
+    """
+    Single-pass keyword extraction for Vision AI responses
+    Backs VisionAI._parse_gemini_response and bulk re-parsing of stored responses
+
+    Each response is lowercased and split into sentences once, rule checks stop
+    at the first keyword found, and sentences for location and recommendations
+    are found from match positions instead of re-lowering every sentence per
+    keyword. Python's substring search beats a combined regex alternation here
+    (the regex engine tries every alternative at every position).
+    """
+
+    def parse(self, response_text, detection_type="general"):
+        """
+        Parse one raw response
+
+        Args:
+            response_text (str): Raw model response
+            detection_type (str): Type of detection performed
+
+        Returns:
+            dict: raw_response, detection_type, violations_detected, summary,
+                  confidence, severity, location, recommendations
+        """
+        text_lower = response_text.lower()
+        # lower() keeps every '.', so dots before a match give its sentence index
+        sentences = response_text.split('.')
+
+        if any(k in text_lower for k in NO_VIOLATION_KEYWORDS):
+            violations = False
+        elif any(k in text_lower for k in VIOLATION_KEYWORDS):
+            violations = True
+        else:
+            violations = None
+
+        location = DEFAULT_LOCATION
+        for keyword in LOCATION_KEYWORDS:
+            position = text_lower.find(keyword)
+            if position >= 0:
+                location = sentences[text_lower.count('.', 0, position)].strip()
+                break
+
+        found = set()
+        for keyword in RECOMMENDATION_KEYWORDS:
+            position = text_lower.find(keyword)
+            while position >= 0:
+                found.add(text_lower.count('.', 0, position))
+                position = text_lower.find(keyword, position + 1)
+        if found:
+            recommendations = [sentences[i].strip() for i in sorted(found)]
+        else:
+            recommendations = list(DEFAULT_RECOMMENDATIONS)
+
+        summary = '. '.join(sentences[:3]).strip()
+
+        return {
+            "raw_response": response_text,
+            "detection_type": detection_type,
+            "violations_detected": violations,
+            "summary": summary if summary else response_text[:200],
+            "confidence": _first_rule(CONFIDENCE_RULES, text_lower, DEFAULT_CONFIDENCE),
+            "severity": _first_rule(SEVERITY_RULES, text_lower, DEFAULT_SEVERITY),
+            "location": location,
+            "recommendations": recommendations
+        }
+
+    def parse_many(self, records, num_workers=1, chunk_size=512):
+        """
+        Parse many stored responses, streaming
+
+        Args:
+            records: Iterable of raw response strings or (response_text, detection_type) tuples
+            num_workers (int): Processes to use (1 = in this process)
+            chunk_size (int): Records handed to a worker at a time
+
+        Yields:
+            dict: One parsed record per input, in input order
+        """
+        if num_workers is None or num_workers <= 1:
+            for record in records:
+                yield self.parse(*_as_args(record))
+            return
+
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            # only a few chunks in flight, so an archive of millions is never all in memory
+            pending = deque()
+            chunk = []
+            for record in records:
+                chunk.append(_as_args(record))
+                if len(chunk) >= chunk_size:
+                    pending.append(pool.submit(_parse_chunk, chunk))
+                    chunk = []
+                    if len(pending) >= num_workers * 2:
+                        yield from pending.popleft().result()
+            if chunk:
+                pending.append(pool.submit(_parse_chunk, chunk))
+            while pending:
+                yield from pending.popleft().result()
+
+
+def _first_rule(rules, text_lower, default):
+    for label, words in rules:
+        if any(w in text_lower for w in words):
+            return label
+    return default
+
+
+def _as_args(record):
+    if isinstance(record, str):
+        return record, "general"
+    return record[0], record[1]
+
+
+#one parser per worker process, created on first use
+_worker_parser = None
+
+
+def _parse_chunk(chunk):
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = ResponseParser()
+    return [_worker_parser.parse(text, detection_type) for text, detection_type in chunk]
@@ -4,33 +4,146 @@ Integrates Gemini and OpenAI Vision APIs for image analysis
 """
 
 import os
+import time
+import random
 import base64
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+
+from models.response_parser import (
+    ResponseParser, DEFAULT_CONFIDENCE, DEFAULT_SEVERITY, DEFAULT_LOCATION, DEFAULT_RECOMMENDATIONS
+)
+from models.vision_providers import timeout_kwargs
 
 # Load environment variables
 load_dotenv()
 
+_parser = ResponseParser()
+
+# Errors worth retrying: quota, overload, server side hiccups, timeouts
+TRANSIENT_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.DeadlineExceeded,
+    asyncio.TimeoutError,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter shared by concurrent requests
+    Allows bursts of up to `capacity` requests, then `rate` requests per second
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 class VisionAI:
     """
     Wrapper for Vision AI APIs (Gemini and OpenAI)
     Analyzes satellite images for environmental violations
     """
+
+    # What each detection type looks for, used by the combined analyze_multi prompt
+    MULTI_TASK_FOCUS = {
+        "sand_mining": "disturbed riverbeds, excavation marks, exposed sand or sediment, "
+                       "sand piles, vehicle tracks near water, changed water flow",
+        "land_encroachment": "new unauthorized structures, construction on forest or protected land, "
+                             "roads in restricted zones, land cleared for development",
+        "vegetation": "cleared forest or vegetation, bare soil, logging or clearing patterns, "
+                      "poor vegetation health"
+    }
+    CONFIDENCE_LEVELS = ("High", "Medium", "Low")
+    SEVERITY_LEVELS = ("Minor", "Moderate", "Severe", "Unknown")
     
-    def __init__(self):
-        """Initialize Vision AI with API keys"""
+    def __init__(self, overviews=None, upload_size=1024, model=None,
+                 max_concurrency=8, requests_per_second=4.0, max_retries=3,
+                 request_timeout=60.0, backoff=1.0, response_cache=None):
+        """
+        Initialize Vision AI with API keys
+
+        Args:
+            overviews (OverviewPyramid): Optional, send the smallest prebuilt level
+                                         >= upload_size instead of the full upload
+            upload_size (int): Resolution the quick path needs
+            model: Optional object with generate_content([prompt, image]) -> .text,
+                   used instead of Gemini (e.g. a local stub in tests)
+            max_concurrency (int): Requests in flight at once in analyze_batch
+            requests_per_second (float): Rate limit for analyze_batch
+            max_retries (int): Retries per image on transient errors
+            request_timeout (float): Seconds before one request is given up (passed to
+                                     the SDK call when it takes a timeout)
+            backoff (float): First retry delay in seconds, doubled every retry
+            response_cache (ResponseCache): Optional, answers repeated requests
+                                            without calling the API
+        """
+        self.overviews = overviews
+        self.upload_size = upload_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        self.backoff = backoff
+        self.response_cache = response_cache
         
         # Get API keys from environment
         self.gemini_key = os.getenv('GEMINI_API_KEY')
+        self.openai_key = os.getenv('OPENAI_API_KEY')
+        gemini_configured = self.gemini_key and self.gemini_key != 'your_actual_gemini_key_here'
+        openai_configured = self.openai_key and self.openai_key != 'your_actual_openai_key_here'
        
         # Configure Gemini
-        if self.gemini_key and self.gemini_key != 'your_actual_gemini_key_here':
+        if model is None and openai_configured:
+            # Gemini first, OpenAI as hedge / fallback (or alone)
+            from models.vision_providers import GeminiProvider, OpenAIProvider, HedgedProvider
+            providers = [GeminiProvider(self.gemini_key)] if gemini_configured else []
+            providers.append(OpenAIProvider(self.openai_key))
+            model = HedgedProvider(providers, max_concurrency=max_concurrency) if len(providers) > 1 else providers[0]
+
+        if model is not None:
+            self.gemini_model = model
+            self.model_name = getattr(model, 'model_name', type(model).__name__)
+            print(f"Vision AI initialized with {self.model_name}")
+        elif gemini_configured:
             genai.configure(api_key=self.gemini_key)
-            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+            self.model_name = 'gemini-1.5-flash'
+            self.gemini_model = genai.GenerativeModel(self.model_name)
             print("Gemini Vision AI initialized")
         else:
             self.gemini_model = None
+            self.model_name = None
             print(" Gemini API key not configured")
+
+        # per-request deadline for the SDK, so a timed-out call really ends
+        self._timeout_kwargs = {}
+        if self.gemini_model is not None:
+            self._timeout_kwargs = timeout_kwargs(self.gemini_model.generate_content, request_timeout)
+            if request_timeout is not None and not self._timeout_kwargs:
+                print("   Note: this model takes no per-request timeout, request_timeout only "
+                      "limits how long a call is awaited")
         
        
     
@@ -59,20 +172,26 @@ class VisionAI:
             }
         
         try:
-            # Load image
-            from PIL import Image
-            img = Image.open(image_path)
-            
             # Create specialized prompt based on detection type
             prompt = self._create_prompt(detection_type)
             
+            # Same image, prompt and model were answered before
+            cache_key, cached = self._cached_response(image_path, prompt)
+            if cached is not None:
+                print(f"✅ Analysis loaded from response cache")
+                return cached
+            
+            # Load image
+            img = self._load_image(image_path)
+            
             print(f"   Sending request to Gemini...")
             
             # Generate response
-            response = self.gemini_model.generate_content([prompt, img])
+            response_text = self._generate(prompt, img)
             
             # Parse response
-            analysis = self._parse_gemini_response(response.text, detection_type)
+            analysis = self._parse_gemini_response(response_text, detection_type)
+            self._store_response(cache_key, response_text, analysis)
             
             print(f"✅ Analysis complete!")
             
@@ -85,6 +204,500 @@ class VisionAI:
                 "description": None
             }
     
+    def analyze_batch(self, image_paths, detection_type="general"):
+        """
+        Analyze many images concurrently (blocking wrapper around analyze_batch_async)
+
+        Args:
+            image_paths (list): Paths to image files
+            detection_type (str): Type of analysis, same for every image
+
+        Returns:
+            list: One analysis dict per image, in input order
+                  (failed images get {"error": ..., "description": None})
+        """
+        return asyncio.run(self.analyze_batch_async(image_paths, detection_type))
+
+    async def analyze_batch_async(self, image_paths, detection_type="general"):
+        """
+        Async version of analyze_batch for callers already inside an event loop
+
+        At most max_concurrency requests are in flight, requests start at no more
+        than requests_per_second, transient errors are retried with exponential
+        backoff and every attempt is cut off after request_timeout seconds (the
+        timeout is passed to the SDK call, see vision_providers.timeout_kwargs).
+
+        A timed-out attempt keeps its concurrency slot until its call really
+        returns, so the limit counts real API calls. At the end the batch waits
+        up to request_timeout more for such calls; a model that takes no timeout
+        and never returns is left behind rather than hanging the batch.
+        """
+        image_paths = list(image_paths)
+        print(f"\n🤖 Analyzing {len(image_paths)} images with Gemini Vision AI...")
+        print(f"   Detection type: {detection_type}, concurrency: {self.max_concurrency}, "
+              f"rate: {self.requests_per_second}/s")
+
+        if not self.gemini_model:
+            return [{"error": "Gemini API not configured", "description": None} for _ in image_paths]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = TokenBucket(self.requests_per_second)
+        prompt = self._create_prompt(detection_type)
+        start = time.perf_counter()
+
+        # blocking SDK calls run on our own pool so concurrency is not capped by the
+        # default one; a slot is held per running call, so max_concurrency threads suffice
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        abandoned = set()
+        try:
+            results = await asyncio.gather(*[
+                self._analyze_one_async(path, prompt, detection_type, semaphore, limiter, pool, abandoned)
+                for path in image_paths
+            ])
+            if abandoned:
+                print(f"   Waiting for {len(abandoned)} timed out calls to return...")
+                _, still_running = await asyncio.wait(set(abandoned), timeout=self.request_timeout)
+                if still_running:
+                    print(f"   ⚠️  {len(still_running)} calls still running, not waiting for them")
+        finally:
+            pool.shutdown(wait=False)
+
+        failed = sum(1 for r in results if r.get("error"))
+        print(f"✅ Batch complete: {len(results) - failed} ok, {failed} failed "
+              f"in {time.perf_counter() - start:.1f}s")
+        return results
+
+    async def _analyze_one_async(self, image_path, prompt, detection_type, semaphore, limiter, pool,
+                                 abandoned):
+        loop = asyncio.get_running_loop()
+        await semaphore.acquire()
+        holding = True
+        try:
+            cache_key, cached = await loop.run_in_executor(
+                pool, self._cached_response, image_path, prompt
+            )
+            if cached is not None:
+                return cached
+            img = await loop.run_in_executor(pool, self._load_image, image_path)
+            for attempt in range(self.max_retries + 1):
+                if not holding:
+                    await semaphore.acquire()
+                    holding = True
+                await limiter.acquire()
+                call = loop.run_in_executor(pool, self._generate, prompt, img)
+                try:
+                    # shield: on timeout the call keeps running, it is not cancelled
+                    response_text = await asyncio.wait_for(asyncio.shield(call), timeout=self.request_timeout)
+                    analysis = self._parse_gemini_response(response_text, detection_type)
+                    self._store_response(cache_key, response_text, analysis)
+                    return analysis
+                except TRANSIENT_ERRORS as e:
+                    if not call.done():
+                        # the still running call keeps this slot until it returns
+                        holding = False
+                        abandoned.add(call)
+                        call.add_done_callback(lambda f: (semaphore.release(), abandoned.discard(f)))
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                    print(f"   Retrying {image_path} in {delay:.1f}s "
+                          f"({type(e).__name__}, attempt {attempt + 1})")
+                    await asyncio.sleep(delay)
+        except Exception as e:
+            print(f"❌ Error analyzing {image_path}: {type(e).__name__} {e}")
+            return {
+                "error": str(e) or type(e).__name__,
+                "description": None
+            }
+        finally:
+            if holding:
+                semaphore.release()
+
+    def analyze_multi(self, image_path, detection_types=("sand_mining", "land_encroachment", "vegetation")):
+        """
+        Run several detection types in one request with structured JSON output
+
+        Args:
+            image_path (str): Path to image file
+            detection_types (tuple): Keys of MULTI_TASK_FOCUS
+
+        Returns:
+            dict: detection_type -> analysis dict with the same fields as
+                  analyze_with_gemini, plus "structured" (False when that type's
+                  JSON was missing or invalid and the keyword heuristics were used)
+        """
+        print(f"\n🤖 Analyzing image with Gemini Vision AI (combined request)...")
+        print(f"   Detection types: {', '.join(detection_types)}")
+
+        unknown = [t for t in detection_types if t not in self.MULTI_TASK_FOCUS]
+        if unknown:
+            raise ValueError(f"Unknown detection types: {unknown}")
+
+        if not self.gemini_model:
+            return {t: {"error": "Gemini API not configured", "description": None}
+                    for t in detection_types}
+
+        try:
+            prompt = self._create_multi_prompt(detection_types)
+
+            cache_key, cached = self._cached_response(image_path, prompt)
+            if cached is not None:
+                print(f"✅ Analysis loaded from response cache")
+                return cached
+
+            img = self._load_image(image_path)
+            print(f"   Sending request to Gemini...")
+            response_text = self._generate(prompt, img)
+
+            results = self._parse_multi_response(response_text, detection_types)
+            self._store_response(cache_key, response_text, results)
+
+            print(f"✅ Analysis complete! ({sum(r['structured'] for r in results.values())}"
+                  f"/{len(results)} types from structured output)")
+            return results
+
+        except Exception as e:
+            print(f"❌ Error with Gemini API: {str(e)}")
+            return {t: {"error": str(e), "description": None} for t in detection_types}
+
+    def _create_multi_prompt(self, detection_types):
+        """One prompt covering every requested detection type, answered as JSON"""
+        focus = "\n".join(f"- {t}: {self.MULTI_TASK_FOCUS[t]}" for t in detection_types)
+        fields = ",\n".join(f'  "{t}": {{...}}' for t in detection_types)
+        return f"""
+You are an expert environmental analyst reviewing satellite/aerial imagery for environmental violations.
+
+Assess this image separately for each of these detection types:
+{focus}
+
+Reply with ONLY a JSON object, no other text, with one entry per detection type:
+{{
+{fields}
+}}
+Each entry must have exactly these fields:
+  "detected": true, false or null (null if uncertain),
+  "confidence": "High", "Medium" or "Low",
+  "severity": "Minor", "Moderate", "Severe" or "Unknown",
+  "location": where in the image, or "Location not specified",
+  "summary": 1-3 factual sentences,
+  "indicators": list of specific things observed,
+  "recommendations": list of recommendations for field verification
+
+Be objective and specific. If nothing is detected for a type, set "detected" to false and say so in the summary.
+"""
+
+    def _parse_multi_response(self, response_text, detection_types):
+        """
+        Validate the combined JSON answer and map it to per-type analysis dicts
+        An answer that is not JSON falls back to the keyword heuristics; a type
+        whose entry is missing or invalid is parsed from its own entry text only,
+        keeping 'detected' if that field alone is valid (None otherwise)
+        """
+        import json
+        import re
+
+        data = None
+        # the model sometimes wraps JSON in a ``` fence or adds a sentence around it
+        match = re.search(r"\{.*\}", response_text, re.DOTALL)
+        if match:
+            try:
+                data = json.loads(match.group(0))
+            except json.JSONDecodeError:
+                data = None
+        if not isinstance(data, dict):
+            print("   Response is not valid JSON, using keyword heuristics")
+            results = {}
+            for detection_type in detection_types:
+                results[detection_type] = self._parse_gemini_response(response_text, detection_type)
+                results[detection_type]["structured"] = False
+            return results
+
+        results = {}
+        for detection_type in detection_types:
+            raw_entry = data.get(detection_type)
+            entry = self._validate_multi_entry(raw_entry)
+            if entry is None:
+                # the whole reply always mentions "detected", so only this entry's text is parsed
+                text, detected = self._salvage_multi_entry(raw_entry)
+                analysis = self._parse_gemini_response(text, detection_type)
+                analysis["raw_response"] = response_text
+                analysis["violations_detected"] = detected
+                analysis["structured"] = False
+            else:
+                analysis = {
+                    "raw_response": response_text,
+                    "detection_type": detection_type,
+                    "violations_detected": entry["detected"],
+                    "summary": entry["summary"],
+                    "confidence": entry["confidence"],
+                    "severity": entry["severity"],
+                    "location": entry["location"] or DEFAULT_LOCATION,
+                    "recommendations": entry["recommendations"] or list(DEFAULT_RECOMMENDATIONS),
+                    "indicators": entry["indicators"],
+                    "structured": True
+                }
+            results[detection_type] = analysis
+        return results
+
+    def _salvage_multi_entry(self, entry):
+        """
+        Text and 'detected' value of an entry that failed validation
+
+        Returns:
+            tuple: (text, detected) - free text of the entry's values, and its
+                   'detected' field if that is a valid yes/no, else None
+        """
+        if isinstance(entry, str):
+            return entry, None
+        if not isinstance(entry, dict):
+            return "", None
+        detected = entry.get("detected")
+        if isinstance(detected, str):
+            detected = {"true": True, "yes": True, "false": False, "no": False}.get(detected.lower())
+        if not isinstance(detected, bool):
+            detected = None
+        parts = []
+        for key in ("summary", "location", "confidence", "severity", "indicators", "recommendations"):
+            value = entry.get(key)
+            if isinstance(value, list):
+                parts.extend(str(v) for v in value)
+            elif value is not None:
+                parts.append(str(value))
+        return ". ".join(parts), detected
+
+    def _validate_multi_entry(self, entry):
+        """Normalized entry, or None if it does not follow the schema"""
+        if not isinstance(entry, dict):
+            return None
+        detected = entry.get("detected")
+        if isinstance(detected, str):
+            detected = {"true": True, "yes": True, "false": False, "no": False}.get(detected.lower())
+        if detected is not None and not isinstance(detected, bool):
+            return None
+
+        confidence = str(entry.get("confidence", "")).capitalize()
+        severity = str(entry.get("severity", "Unknown")).capitalize()
+        if confidence not in self.CONFIDENCE_LEVELS or severity not in self.SEVERITY_LEVELS:
+            return None
+
+        summary = entry.get("summary")
+        location = entry.get("location", "")
+        indicators = entry.get("indicators", [])
+        recommendations = entry.get("recommendations", [])
+        if not isinstance(summary, str) or not isinstance(location, str):
+            return None
+        if isinstance(indicators, str):
+            indicators = [indicators]
+        if isinstance(recommendations, str):
+            recommendations = [recommendations]
+        if not isinstance(indicators, list) or not isinstance(recommendations, list):
+            return None
+
+        return {
+            "detected": detected,
+            "confidence": confidence,
+            "severity": severity,
+            "location": location.strip(),
+            "summary": summary.strip(),
+            "indicators": [str(i) for i in indicators],
+            "recommendations": [str(r) for r in recommendations]
+        }
+
+    def _cached_response(self, image_path, prompt):
+        """
+        Look the request up in the response cache
+
+        Returns:
+            tuple: (cache_key, analysis) - key is None without a cache,
+                   analysis is None on a miss
+        """
+        if self.response_cache is None or not os.path.exists(image_path):
+            return None, None
+        # an overview level is a different upload than the original
+        factor = self.overviews.level_factor(image_path, self.upload_size) if self.overviews is not None else None
+        variant = f"overview{factor}" if factor else ""
+        cache_key = self.response_cache.make_key(image_path, prompt, self.model_name, variant)
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        raw_text, analysis = cached
+        return cache_key, analysis
+
+    def _store_response(self, cache_key, response_text, analysis):
+        if cache_key is not None:
+            self.response_cache.put(cache_key, response_text, analysis)
+
+    def analyze_changes(self, image_path, change_mask=None, regions=None, detection_type="general",
+                        padding=32, max_side=512, max_bytes=100 * 1024, max_crops=8, min_area=64,
+                        mask_shape=None):
+        """
+        Analyze only the changed parts of a scene
+
+        Changed regions are cropped (with padding) from the full-resolution image,
+        downscaled to max_side and re-encoded as JPEG under max_bytes each, so the
+        upload grows with how much changed rather than with the scene size.
+
+        Args:
+            image_path (str): Later image of the pair
+            change_mask: Binary mask from ChangeDetector.detect_changes (any resolution,
+                         bounding boxes are scaled to the image)
+            regions (list): Or region dicts from ChangeDetector.extract_change_regions
+                            (only "bbox" is used, in change_mask / detector coordinates;
+                            needs change_mask or mask_shape to map them to the image)
+            detection_type (str): Type of analysis, as in analyze_with_gemini
+            padding (int): Context kept around each region, in image pixels
+            max_side (int): Longest side of a crop after downscaling
+            max_bytes (int): JPEG size budget per crop
+            max_crops (int): Largest regions sent, the rest are dropped
+            min_area (int): Ignore mask regions smaller than this (mask pixels)
+            mask_shape (tuple): (height, width) the regions were detected at, when
+                                change_mask is not passed
+
+        Returns:
+            dict: Analysis as in analyze_with_gemini, plus
+                  crops (bbox, size, bytes, quality per crop), upload_bytes, full_image_bytes
+        """
+        print(f"\n🤖 Analyzing changed regions with Gemini Vision AI...")
+        print(f"   Detection type: {detection_type}")
+
+        if not self.gemini_model:
+            return {
+                "error": "Gemini API not configured",
+                "description": None
+            }
+
+        try:
+            from PIL import Image
+            img = Image.open(image_path).convert('RGB')
+            boxes = self._change_boxes(img.size, change_mask, regions, padding, max_crops, min_area,
+                                       mask_shape)
+            full_image_bytes = os.path.getsize(image_path)
+
+            if not boxes:
+                print(f"✅ No changed regions, nothing to send")
+                return {
+                    "raw_response": "",
+                    "detection_type": detection_type,
+                    "violations_detected": False,
+                    "summary": "No changed regions",
+                    "confidence": DEFAULT_CONFIDENCE,
+                    "severity": DEFAULT_SEVERITY,
+                    "location": DEFAULT_LOCATION,
+                    "recommendations": [],
+                    "crops": [],
+                    "upload_bytes": 0,
+                    "full_image_bytes": full_image_bytes
+                }
+
+            crops = []
+            blobs = []
+            for box in boxes:
+                data, size, quality = self._encode_crop(img.crop(box), max_side, max_bytes)
+                blobs.append({"mime_type": "image/jpeg", "data": data})
+                crops.append({"bbox": box, "size": size, "bytes": len(data), "quality": quality})
+            upload_bytes = sum(c["bytes"] for c in crops)
+            print(f"   {len(crops)} crops, {upload_bytes / 1024:.1f} KB "
+                  f"(full image {full_image_bytes / 1024:.1f} KB)")
+
+            box_text = "\n".join(
+                f"Crop {i + 1}: x={x0}-{x1}, y={y0}-{y1}" for i, (x0, y0, x1, y1) in enumerate(boxes)
+            )
+            prompt = (self._create_prompt(detection_type) +
+                      f"\nThe {len(boxes)} images are crops of the areas that changed since the "
+                      f"previous acquisition, from a {img.size[0]}x{img.size[1]} pixel scene:\n"
+                      f"{box_text}\nRefer to crops by number when giving locations.\n")
+
+            cache_key, analysis = self._cached_response(image_path, prompt)
+            if analysis is None:
+                print(f"   Sending request to Gemini...")
+                response_text = self._generate(prompt, *blobs)
+                analysis = self._parse_gemini_response(response_text, detection_type)
+                self._store_response(cache_key, response_text, analysis)
+
+            analysis = dict(analysis, crops=crops, upload_bytes=upload_bytes,
+                            full_image_bytes=full_image_bytes)
+            print(f"✅ Analysis complete!")
+            return analysis
+
+        except Exception as e:
+            print(f"❌ Error with Gemini API: {str(e)}")
+            return {
+                "error": str(e),
+                "description": None
+            }
+
+    def _change_boxes(self, image_size, change_mask, regions, padding, max_crops, min_area, mask_shape=None):
+        """Padded (x0, y0, x1, y1) boxes in image pixels, largest regions first"""
+        width, height = image_size
+        if regions is None:
+            if change_mask is None:
+                raise ValueError("Need change_mask or regions")
+            import cv2
+            mask = change_mask[:, :, 0] if change_mask.ndim > 2 else change_mask
+            _, _, stats, _ = cv2.connectedComponentsWithStats((mask > 0).astype('uint8'), connectivity=8)
+            regions = [
+                {"bbox": tuple(int(v) for v in row[:4]), "area": int(row[4])}
+                for row in stats[1:] if row[4] >= min_area
+            ]
+            mask_height, mask_width = mask.shape
+        elif change_mask is not None:
+            mask_height, mask_width = change_mask.shape[:2]
+        elif mask_shape is not None:
+            mask_height, mask_width = mask_shape[:2]
+        else:
+            # detectors usually run on a reduced image, guessing the scale would crop the wrong area
+            raise ValueError("regions need change_mask or mask_shape to be mapped to the image")
+
+        regions = sorted(regions, key=lambda r: r.get("area", r["bbox"][2] * r["bbox"][3]), reverse=True)
+        sx, sy = width / mask_width, height / mask_height
+        boxes = []
+        for region in regions[:max_crops]:
+            x, y, w, h = region["bbox"]
+            boxes.append((
+                max(0, int(x * sx) - padding),
+                max(0, int(y * sy) - padding),
+                min(width, int(round((x + w) * sx)) + padding),
+                min(height, int(round((y + h) * sy)) + padding)
+            ))
+        return boxes
+
+    def _encode_crop(self, crop, max_side, max_bytes):
+        """
+        JPEG bytes under max_bytes: lower quality first, then halve the size
+
+        Returns:
+            tuple: (jpeg bytes, (width, height), quality)
+        """
+        import io
+        from PIL import Image
+        scale = min(1.0, max_side / max(crop.size))
+        if scale < 1.0:
+            crop = crop.resize((max(1, round(crop.width * scale)), max(1, round(crop.height * scale))),
+                               Image.LANCZOS)
+        while True:
+            for quality in (85, 75, 65, 55, 45):
+                buffer = io.BytesIO()
+                crop.save(buffer, format='JPEG', quality=quality, optimize=True)
+                if buffer.tell() <= max_bytes:
+                    return buffer.getvalue(), crop.size, quality
+            if max(crop.size) <= 32:
+                return buffer.getvalue(), crop.size, quality
+            crop = crop.resize((max(1, crop.width // 2), max(1, crop.height // 2)), Image.LANCZOS)
+
+    def _generate(self, prompt, *images):
+        """One request to the model, returns the response text"""
+        response = self.gemini_model.generate_content([prompt, *images], **self._timeout_kwargs)
+        return response.text
+
+    def _load_image(self, image_path):
+        """Image to send: a prebuilt overview level if one fits, else the original"""
+        from PIL import Image
+        if self.overviews is not None:
+            level = self.overviews.load(image_path, self.upload_size)
+            if level is not None:
+                return Image.fromarray(level)
+        return Image.open(image_path)
+
     def _create_prompt(self, detection_type):
         """
         Create specialized prompt based on detection type
@@ -203,113 +816,5 @@ Be objective, specific, and actionable.
         Returns:
             dict: Structured analysis results
         """
-        
-        # Extract key information from response
-        analysis = {
-            "raw_response": response_text,
-            "detection_type": detection_type,
-            "violations_detected": self._detect_violations(response_text),
-            "summary": self._extract_summary(response_text),
-            "confidence": self._extract_confidence(response_text),
-            "severity": self._extract_severity(response_text),
-            "location": self._extract_location(response_text),
-            "recommendations": self._extract_recommendations(response_text)
-        }
-        
-        return analysis
-    
-    def _detect_violations(self, text):
-        """Check if violations were detected"""
-        text_lower = text.lower()
-        
-        # Keywords indicating violations
-        violation_keywords = [
-            "yes", "detected", "evidence", "visible", "observed",
-            "mining", "excavation", "encroachment", "clearing",
-            "unauthorized", "illegal", "violation"
-        ]
-        
-        no_violation_keywords = [
-            "no evidence", "not detected", "no violations",
-            "normal", "natural", "no signs", "unclear"
-        ]
-        
-        # Check for negative indicators first
-        for keyword in no_violation_keywords:
-            if keyword in text_lower:
-                return False
-        
-        # Check for positive indicators
-        for keyword in violation_keywords:
-            if keyword in text_lower:
-                return True
-        
-        return None  # Uncertain
-    
-    def _extract_summary(self, text):
-        """Extract first 2-3 sentences as summary"""
-        sentences = text.split('.')
-        summary = '. '.join(sentences[:3]).strip()
-        return summary if summary else text[:200]
-    
-    def _extract_confidence(self, text):
-        """Extract confidence level"""
-        text_lower = text.lower()
-        
-        if "high confidence" in text_lower or "confident" in text_lower:
-            return "High"
-        elif "medium confidence" in text_lower or "moderate" in text_lower:
-            return "Medium"
-        elif "low confidence" in text_lower or "uncertain" in text_lower:
-            return "Low"
-        else:
-            return "Medium"  # Default
-    
-    def _extract_severity(self, text):
-        """Extract severity assessment"""
-        text_lower = text.lower()
-        
-        if "severe" in text_lower or "significant" in text_lower or "major" in text_lower:
-            return "Severe"
-        elif "moderate" in text_lower or "medium" in text_lower:
-            return "Moderate"
-        elif "minor" in text_lower or "small" in text_lower or "limited" in text_lower:
-            return "Minor"
-        else:
-            return "Unknown"
-    
-    def _extract_location(self, text):
-        """Extract location description"""
-        text_lower = text.lower()
-        
-        # Common location patterns
-        location_keywords = [
-            "northeastern", "northwestern", "southeastern", "southwestern",
-            "northern", "southern", "eastern", "western",
-            "center", "central", "middle",
-            "riverbank", "riverside", "along the river",
-            "upper", "lower", "left", "right"
-        ]
-        
-        for keyword in location_keywords:
-            if keyword in text_lower:
-                # Find sentence containing location
-                for sentence in text.split('.'):
-                    if keyword in sentence.lower():
-                        return sentence.strip()
-        
-        return "Location not specified"
-    
-    def _extract_recommendations(self, text):
-        """Extract recommendations if present"""
-        text_lower = text.lower()
-        
-        if "recommend" in text_lower or "suggest" in text_lower:
-            # Find recommendation sentences
-            recommendations = []
-            for sentence in text.split('.'):
-                if "recommend" in sentence.lower() or "suggest" in sentence.lower():
-                    recommendations.append(sentence.strip())
-            return recommendations if recommendations else ["Field verification recommended"]
-        
-        return ["Field verification recommended"]
\ No newline at end of file
+        # one set of keyword rules, shared with bulk re-parsing
+        return _parser.parse(response_text, detection_type)
@@ -0,0 +1,320 @@
+"""
+Vision AI providers for SEVAS
+Gemini and OpenAI behind one interface, plus a hedging policy so one slow or
+failing provider does not stall the quick path
+"""
+
+import io
+import time
+import base64
+import asyncio
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def timeout_kwargs(generate_content, timeout):
+    """
+    Keyword arguments that give one generate_content call its own deadline
+
+    google-generativeai >= 0.4 takes request_options={"timeout": ...}, the
+    providers below take timeout=...; an SDK without either (0.3.x) gets {}
+    and its calls cannot be cut short by the client.
+    """
+    if timeout is None:
+        return {}
+    try:
+        parameters = inspect.signature(generate_content).parameters
+    except (TypeError, ValueError):
+        return {}
+    if "request_options" in parameters:
+        return {"request_options": {"timeout": timeout}}
+    if "timeout" in parameters:
+        return {"timeout": timeout}
+    return {}
+
+
+class ProviderResponse:
+    """Model answer, shaped like Gemini's response (.text) so VisionAI can use any provider"""
+
+    def __init__(self, text, provider, latency):
+        self.text = text
+        self.provider = provider
+        self.latency = latency
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with log-spaced buckets (10 ms to ~160 s, 8 per doubling)
+    Thread safe, cheap to update, quantiles accurate to one bucket (~9%)
+    """
+
+    def __init__(self, min_seconds=0.01, max_seconds=160.0, buckets_per_doubling=8):
+        self.edges = min_seconds * 2.0 ** (np.arange(
+            int(np.ceil(np.log2(max_seconds / min_seconds) * buckets_per_doubling)) + 1
+        ) / buckets_per_doubling)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[np.searchsorted(self.edges, seconds)] += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """Upper edge of the bucket holding the q-quantile, None without samples"""
+        with self._lock:
+            total = self.counts.sum()
+            if total == 0:
+                return None
+            bucket = int(np.searchsorted(np.cumsum(self.counts), q * total))
+        return float(self.edges[min(bucket, len(self.edges) - 1)])
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+
+
+class VisionProvider:
+    """
+    One vision model API
+    Subclasses implement _generate(prompt, images, timeout) -> text; generate_content
+    times every call into self.latency
+    """
+
+    name = "provider"
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+
+    # VisionAI reads model_name for cache keys
+    @property
+    def model_name(self):
+        return self.name
+
+    def generate_content(self, contents, timeout=None):
+        """
+        Args:
+            contents (list): [prompt, image, ...] - PIL images or
+                             {"mime_type": ..., "data": bytes} blobs
+            timeout (float): Seconds the API call may take (None = client default)
+
+        Returns:
+            ProviderResponse: .text, .provider, .latency
+        """
+        prompt, images = contents[0], contents[1:]
+        start = time.perf_counter()
+        try:
+            text = self._generate(prompt, images, timeout)
+        except Exception:
+            self.latency.record_error()
+            raise
+        seconds = time.perf_counter() - start
+        self.latency.record(seconds)
+        return ProviderResponse(text, self.name, seconds)
+
+    def _generate(self, prompt, images, timeout=None):
+        raise NotImplementedError
+
+
+class GeminiProvider(VisionProvider):
+    """Google Gemini vision (google.generativeai)"""
+
+    def __init__(self, api_key, model_name="gemini-1.5-flash"):
+        super().__init__()
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        self.name = model_name
+
+    def _generate(self, prompt, images, timeout=None):
+        kwargs = timeout_kwargs(self.model.generate_content, timeout)
+        return self.model.generate_content([prompt, *images], **kwargs).text
+
+
+class OpenAIProvider(VisionProvider):
+    """OpenAI vision chat models"""
+
+    def __init__(self, api_key, model_name="gpt-4o-mini", max_tokens=1024):
+        super().__init__()
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key)
+        self.name = model_name
+        self.max_tokens = max_tokens
+
+    def _generate(self, prompt, images, timeout=None):
+        content = [{"type": "text", "text": prompt}]
+        for image in images:
+            mime_type, data = _image_bytes(image)
+            url = f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+            content.append({"type": "image_url", "image_url": {"url": url}})
+        response = self.client.chat.completions.create(
+            model=self.name,
+            messages=[{"role": "user", "content": content}],
+            max_tokens=self.max_tokens,
+            **({"timeout": timeout} if timeout is not None else {})
+        )
+        return response.choices[0].message.content
+
+
+def _image_bytes(image):
+    if isinstance(image, dict):
+        return image["mime_type"], image["data"]
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=90)
+    return "image/jpeg", buffer.getvalue()
+
+
+class HedgedProvider:
+    """
+    Latency-aware policy over several providers
+
+    The request goes to the first provider. If it has not answered by its p95
+    latency after it was started (from its own histogram, default_deadline
+    until min_samples calls were timed), the same request is sent to the next
+    provider and whichever
+    answers first wins; the other is cancelled (its result is ignored, its
+    latency is still recorded). A provider that fails hands over to the next
+    one straight away.
+
+    Every provider runs on its own thread pool, sized for max_concurrency
+    callers, so a hedge never queues behind primaries that are still running.
+    """
+
+    def __init__(self, providers, hedge_quantile=0.95, min_samples=20, default_deadline=5.0,
+                 timeout=120.0, max_concurrency=8):
+        """
+        Initialize hedging policy
+
+        Args:
+            providers (list): VisionProvider objects, preferred first
+            hedge_quantile (float): Latency quantile of a provider used as its hedge deadline
+            min_samples (int): Timed calls needed before the histogram is trusted
+            default_deadline (float): Hedge deadline in seconds until then
+            timeout (float): Give up after this many seconds in total
+            max_concurrency (int): Calls made at once by callers (e.g. VisionAI.max_concurrency)
+        """
+        if not providers:
+            raise ValueError("Need at least one provider")
+        self.providers = list(providers)
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.default_deadline = default_deadline
+        self.timeout = timeout
+        self.name = "hedged(" + ",".join(p.name for p in self.providers) + ")"
+        self.hedges = 0
+        self.wins = {p.name: 0 for p in self.providers}
+        # one pool per provider, with spare workers for dropped calls that are still running
+        self._pools = [ThreadPoolExecutor(max_workers=2 * max_concurrency) for _ in self.providers]
+        self._lock = threading.Lock()
+
+        print(f"HedgedProvider initialized: {', '.join(p.name for p in self.providers)}")
+
+    # VisionAI reads model_name for cache keys
+    @property
+    def model_name(self):
+        return self.name
+
+    def deadline(self, provider):
+        """Seconds to wait for provider before hedging"""
+        if provider.latency.count < self.min_samples:
+            return self.default_deadline
+        return provider.latency.quantile(self.hedge_quantile)
+
+    def generate_content(self, contents, timeout=None):
+        """Blocking call (VisionAI runs it on its own worker threads)"""
+        return asyncio.run(self.generate_content_async(contents, timeout))
+
+    async def generate_content_async(self, contents, timeout=None):
+        """
+        Args:
+            contents (list): [prompt, image, ...]
+            timeout (float): Overall limit for this call, also passed to every
+                             provider call (capped by self.timeout)
+        """
+        loop = asyncio.get_running_loop()
+        limit = self.timeout if timeout is None else min(timeout, self.timeout)
+        waiting = list(range(len(self.providers)))
+        running = {}
+        errors = []
+        started = time.perf_counter()
+        # (provider, hedge time) of the provider launched last
+        newest = None
+
+        def launch():
+            nonlocal newest
+            index = waiting.pop(0)
+            provider = self.providers[index]
+            call = functools.partial(provider.generate_content, contents, timeout=limit)
+            future = loop.run_in_executor(self._pools[index], call)
+            running[future] = provider
+            newest = (provider, time.perf_counter() + self.deadline(provider))
+            return provider
+
+        launch()
+        try:
+            while running:
+                # next hedge when the newest provider passes its deadline, counted from its launch
+                now = time.perf_counter()
+                remaining = limit - (now - started)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"No provider answered within {limit}s")
+                wait_for = min(newest[1] - now, remaining) if waiting else remaining
+
+                done = set()
+                if wait_for > 0:
+                    done, _ = await asyncio.wait(running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if waiting and time.perf_counter() >= newest[1]:
+                        slow = newest[0]
+                        hedge = launch()
+                        with self._lock:
+                            self.hedges += 1
+                        print(f"   {slow.name} slower than {self.deadline(slow):.2f}s, hedging with {hedge.name}")
+                    continue
+
+                for future in done:
+                    provider = running.pop(future)
+                    try:
+                        response = future.result()
+                    except Exception as e:
+                        errors.append(f"{provider.name}: {type(e).__name__} {e}")
+                        print(f"   {provider.name} failed ({type(e).__name__}), trying next provider")
+                        continue
+                    with self._lock:
+                        self.wins[provider.name] += 1
+                    return response
+
+                # every running provider failed, hand over to the next one
+                if not running and waiting:
+                    launch()
+
+            raise RuntimeError("All providers failed: " + "; ".join(errors))
+        finally:
+            # losers keep their thread until they return, their answer is dropped
+            for future in running:
+                future.cancel()
+
+    def stats(self):
+        """Per-provider latency histograms plus hedge and win counts"""
+        return {
+            "hedges": self.hedges,
+            "wins": dict(self.wins),
+            "latency": {p.name: p.latency.as_dict() for p in self.providers}
+        }
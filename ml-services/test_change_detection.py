@@ -65,12 +65,134 @@ else:
                 change_mask
             )
             
+            # Region-level view of the same mask
+            print("\n" + "="*70)
+            regions = change_detector.extract_change_regions(
+                change_mask,
+                img_before,
+                img_after,
+                min_area=50
+            )
+            for region in regions[:3]:
+                print(f"   Region {region['id']}: bbox {region['bbox']}, "
+                      f"area {region['area']} px, type {region['type']}")
+
+            # Same pair as GeoTIFFs, processed tile by tile
+            print("\n" + "="*70)
+            import tempfile
+            import rasterio
+
+            tmp_dir = tempfile.mkdtemp()
+            tiff_paths = []
+            for name, img in (("before", img_before), ("after", img_after)):
+                path = os.path.join(tmp_dir, f"{name}.tif")
+                with rasterio.open(path, 'w', driver='GTiff', height=img.shape[0], width=img.shape[1],
+                                   count=3, dtype='uint8', crs='EPSG:32643',
+                                   transform=rasterio.transform.from_origin(600000, 3000000, 10, 10)) as dst:
+                    dst.write(np.moveaxis(img, -1, 0))
+                tiff_paths.append(path)
+
+            mask_path = os.path.join(tmp_dir, "change_mask.tif")
+            tiled = change_detector.detect_changes_tiled(
+                tiff_paths[0], tiff_paths[1], mask_path, block_size=64, num_workers=4
+            )
+            with rasterio.open(mask_path) as src:
+                tiled_mask = src.read(1)
+            print(f"   Tiled mask matches in-memory mask: {np.array_equal(tiled_mask, change_mask)}")
+
+            # Float rasters: 0-255 floats must not be rescaled, 0-1 floats must be,
+            # and each raster's range is checked on its own
+            float_paths = []
+            for name, img in (("before_255", img_before.astype(np.float32)),
+                              ("after_unit", img_after.astype(np.float32) / 255)):
+                path = os.path.join(tmp_dir, f"{name}.tif")
+                with rasterio.open(path, 'w', driver='GTiff', height=img.shape[0], width=img.shape[1],
+                                   count=3, dtype='float32', crs='EPSG:32643',
+                                   transform=rasterio.transform.from_origin(600000, 3000000, 10, 10)) as dst:
+                    dst.write(np.moveaxis(img, -1, 0))
+                float_paths.append(path)
+            change_detector.detect_changes_tiled(
+                float_paths[0], float_paths[1], mask_path, block_size=64, num_workers=4
+            )
+            with rasterio.open(mask_path) as src:
+                float_mask = src.read(1)
+            expected_mask, _, _ = change_detector.detect_changes(
+                img_before.astype(np.float32), img_after.astype(np.float32) / 255)
+            print(f"   Float rasters match detect_changes: {np.array_equal(float_mask, expected_mask)}")
+            assert np.array_equal(float_mask, expected_mask)
+
+            # uint16 reflectance: refused without max_value, scaled to 0-255 with it
+            from utils.cloud_detector import CloudDetector
+            dn_paths = []
+            dn_images = []
+            for name, img in (("before_dn", img_before), ("after_dn", img_after)):
+                dn = (img.astype(np.int64) * 10000 // 255).astype(np.uint16)
+                path = os.path.join(tmp_dir, f"{name}.tif")
+                with rasterio.open(path, 'w', driver='GTiff', height=img.shape[0], width=img.shape[1],
+                                   count=3, dtype='uint16', crs='EPSG:32643',
+                                   transform=rasterio.transform.from_origin(600000, 3000000, 10, 10)) as dst:
+                    dst.write(np.moveaxis(dn, -1, 0))
+                dn_paths.append(path)
+                dn_images.append(CloudDetector.to_byte_range(dn, 255.0 / 10000))
+            assert change_detector.detect_changes_tiled(dn_paths[0], dn_paths[1], mask_path, block_size=64) is None
+            change_detector.detect_changes_tiled(dn_paths[0], dn_paths[1], mask_path, block_size=64,
+                                                 max_value=10000)
+            with rasterio.open(mask_path) as src:
+                dn_mask = src.read(1)
+            expected_mask, _, _ = change_detector.detect_changes(*dn_images)
+            print(f"   uint16 rasters with max_value match detect_changes: {np.array_equal(dn_mask, expected_mask)}")
+            assert np.array_equal(dn_mask, expected_mask)
+
+            # Time series: before, after, after darkened further
+            print("\n" + "="*70)
+            img_later = (img_after * 0.8).astype(np.uint8)
+            series = change_detector.detect_changes_stack(np.stack([img_before, img_after, img_later]))
+            print(f"   First pair matches detect_changes: "
+                  f"{np.array_equal(series['consecutive_masks'][0], change_mask)}")
+
+            # Extra bands are ignored and single-band stacks are grayscale, as in detect_changes
+            nir_before = np.dstack([img_before, img_before[:, :, :1]])
+            nir_after = np.dstack([img_after, 255 - img_after[:, :, :1]])
+            series4 = change_detector.detect_changes_stack(np.stack([nir_before, nir_after]))
+            mask4, _, _ = change_detector.detect_changes(nir_before, nir_after)
+            gray_before, gray_after = img_before[:, :, 1], img_after[:, :, 1]
+            series1 = change_detector.detect_changes_stack(
+                np.stack([gray_before, gray_after])[..., None])
+            mask1, _, _ = change_detector.detect_changes(gray_before, gray_after)
+            print(f"   4-band stack matches: {np.array_equal(series4['consecutive_masks'][0], mask4)}, "
+                  f"1-band stack matches: {np.array_equal(series1['consecutive_masks'][0], mask1)}")
+            assert np.array_equal(series4['consecutive_masks'][0], mask4)
+            assert np.array_equal(series1['consecutive_masks'][0], mask1)
+
+            # Float dates are not truncated, and each date's range is decided on its own
+            fraction = np.random.default_rng(1).uniform(0, 1, img_after.shape).astype(np.float32)
+            float_before = img_before.astype(np.float32)
+            float_after = img_after.astype(np.float32) + fraction
+            series_f = change_detector.detect_changes_stack(np.stack([float_before, float_after]))
+            mask_f, _, _ = change_detector.detect_changes(float_before, float_after)
+            series_mixed = change_detector.detect_changes_stack(np.stack([float_before / 255, float_after]))
+            mask_mixed, _, _ = change_detector.detect_changes(float_before / 255, float_after)
+            print(f"   Float stack matches: {np.array_equal(series_f['consecutive_masks'][0], mask_f)}, "
+                  f"0-1 next to 0-255 matches: {np.array_equal(series_mixed['consecutive_masks'][0], mask_mixed)}")
+            assert np.array_equal(series_f['consecutive_masks'][0], mask_f)
+            assert np.array_equal(series_mixed['consecutive_masks'][0], mask_mixed)
+
+            # Coarse-to-fine mode with a sampled estimate
+            print("\n" + "="*70)
+            pyramid_mask, pyramid_pct, details = change_detector.detect_changes_pyramid(
+                img_before, img_after, factor=8, block_size=32, sample_size=5000
+            )
+            agreement = (pyramid_mask == change_mask).mean() * 100
+            print(f"   Pyramid vs full mask agreement: {agreement:.2f}% "
+                  f"(full {change_pct:.2f}%, pyramid {pyramid_pct:.2f}%)")
+
             print("\n" + "=" * 70)
             print("✅ CHANGE DETECTION COMPLETE!")
             print("\n📊 Summary:")
             print(f"   Change detected: {change_pct:.2f}% of image")
             print(f"   Change type: {analysis.get('type', 'unknown')}")
             print(f"   Description: {analysis.get('description', 'N/A')}")
+            print(f"   Change regions: {len(regions)}")
             print("\n📁 Generated file:")
             print("   outputs/change_detection.png")
             print("=" * 70)
@@ -42,6 +42,25 @@ else:
                     'outputs/cloud_detection.png'
                 )
                 
+                # Sampled screening on the full-resolution image
+                print("\n" + "="*70)
+                screening = cloud_detector.screen_clouds(img, seed=0)
+                print(f"   Screened: {screening['method']} from {screening['samples']} pixels, "
+                      f"usable: {screening['usable']} (full mask says {is_usable})")
+
+                # Batch ranking: the test scene plus brighter (cloudier) versions of it
+                print("\n" + "="*70)
+                catalogue = np.stack([
+                    img_resized,
+                    cv2.convertScaleAbs(img_resized, alpha=1.6),
+                    cv2.convertScaleAbs(img_resized, alpha=1.2)
+                ])
+                batch = cloud_detector.detect_clouds_batch(catalogue, return_masks=True)
+                print(f"   Batch cloud %: {np.round(batch['cloud_percentages'], 2).tolist()}")
+                print(f"   Ranking (clearest first): {batch['ranking'].tolist()}")
+                unpacked = np.unpackbits(batch['masks'][0], axis=-1)[:, :img_resized.shape[1]]
+                print(f"   First mask matches detect_clouds: {np.array_equal(unpacked, cloud_mask)}")
+
                 print("\n" + "=" * 70)
                 print(" CLOUD DETECTION COMPLETE!")
                 print("\n Results:")
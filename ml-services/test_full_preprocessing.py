@@ -3,6 +3,7 @@ Test complete preprocessing pipeline
 """
 
 import os
+import numpy as np
 import sys
 
 # Add the parent directory to Python path
@@ -11,28 +12,75 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from utils.image_processor import ImageProcessor
 
-# Create processor
-processor = ImageProcessor(target_size=256)
+# preprocessing workers are spawned and import this script, only run it as main
+if __name__ == "__main__":
+    # Create processor
+    processor = ImageProcessor(target_size=256)
 
-# Path to test image
-test_image_path = 'uploads/test_image.jpg'
+    # Path to test image
+    test_image_path = 'uploads/test_image.jpg'
 
-# Check if file exists
-if not os.path.exists(test_image_path):
-    print(f"❌ Test image not found at {test_image_path}. Please ensure the test image is available.")
-    print("   You can use any river/landscape satellite image from Google Images")
-else:
-    # Preprocess the image
-    preprocessed = processor.preprocess_image(test_image_path)
+    # Check if file exists
+    if not os.path.exists(test_image_path):
+        print(f"❌ Test image not found at {test_image_path}. Please ensure the test image is available.")
+        print("   You can use any river/landscape satellite image from Google Images")
+    else:
+        # Preprocess the image
+        preprocessed = processor.preprocess_image(test_image_path)
     
-    if preprocessed is not None:
-        # Save comparison
-        processor.save_preprocessed_comparison(
-            test_image_path,
-            preprocessed,
-            'outputs/preprocessed_comparison.jpg'
-        )
+        if preprocessed is not None:
+            # Save comparison
+            processor.save_preprocessed_comparison(
+                test_image_path,
+                preprocessed,
+                'outputs/preprocessed_comparison.jpg'
+            )
         
+            print("\n" + "="*60)
+            print("🎉 SUCCESS! Check ml-services/outputs/preprocessed_comparison.jpg")
+            print("="*60)
+
+        # Batch preprocessing: sequential vs process pool
+        batch_paths = [test_image_path, 'uploads/missing.jpg', test_image_path]
+
+        sequential = processor.preprocess_batch(batch_paths)
+        parallel = processor.preprocess_batch(batch_paths, num_workers=2, chunk_size=1)
+
         print("\n" + "="*60)
-        print("🎉 SUCCESS! Check ml-services/outputs/preprocessed_comparison.jpg")
+        print(f"Sequential batch: {sequential.shape}, parallel batch: {parallel.shape}")
+        print(f"Same output: {np.array_equal(sequential, parallel)}")
+        print(f"Failed paths: {processor.failed_paths}")
         print("="*60)
+
+        # Streaming batches: same images as the one-shot batch, delivered in pieces
+        streamed = [batch for batch, _ in processor.iter_batches(batch_paths, batch_size=1, prefetch=2)]
+        print(f"Streamed batches: {[b.shape for b in streamed]}")
+        print(f"Same output: {np.array_equal(np.concatenate(streamed), sequential)}")
+
+        # Stopping early with workers: queued images are dropped, not decoded
+        import time
+        start = time.perf_counter()
+        stream = processor.iter_batches([test_image_path] * 12, batch_size=1, prefetch=1,
+                                        num_workers=2, chunk_size=1)
+        next(stream)
+        first_batch = time.perf_counter() - start
+        stream.close()
+        print(f"First streamed batch after {first_batch:.1f}s, "
+              f"stopped after {time.perf_counter() - start:.1f}s (12 queued images)")
+
+        # Content-addressed cache: second run skips decode and resize
+        import tempfile
+        from utils.preprocess_cache import PreprocessCache
+
+        cache = PreprocessCache(tempfile.mkdtemp(), max_bytes=64 * 1024 * 1024)
+        cached_processor = ImageProcessor(target_size=256, cache=cache)
+        first = cached_processor.preprocess_image(test_image_path)
+        second = cached_processor.preprocess_image(test_image_path)
+        print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+        print(f"Same output: {np.array_equal(first, second)}")
+
+        # Reduced-resolution JPEG decode (quick path)
+        fast_processor = ImageProcessor(target_size=256, fast_decode=True)
+        fast = fast_processor.preprocess_image(test_image_path)
+        print(f"Fast decode shape: {fast.shape}, "
+              f"mean abs difference vs full decode: {np.abs(fast - preprocessed).mean():.4f}")
@@ -0,0 +1,108 @@
+"""
+Test overview pyramids built at ingest
+"""
+
+import os
+import shutil
+import tempfile
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from utils.overview_pyramid import OverviewPyramid
+from utils.image_processor import ImageProcessor
+from utils.cloud_detector import CloudDetector
+
+test_image_path = 'uploads/test_image.jpg'
+
+if not os.path.exists(test_image_path):
+    print("❌ Test image not found")
+else:
+    print("=" * 70)
+    print("🧪 TESTING OVERVIEW PYRAMIDS - SEVAS")
+    print("=" * 70)
+
+    tmp_dir = tempfile.mkdtemp()
+    pyramid = OverviewPyramid(factors=(2, 4, 8), cache_dir=tmp_dir)
+
+    # JPEG upload: sidecar levels
+    print("\n📂 Ingesting JPEG upload...")
+    pyramid.build(test_image_path)
+    level = pyramid.load(test_image_path, 256)
+    print(f"   Level for 256 px consumers: {level.shape}")
+
+    processor = ImageProcessor(target_size=256, overviews=pyramid)
+    from_overview = processor.preprocess_image(test_image_path)
+    full = ImageProcessor(target_size=256).preprocess_image(test_image_path)
+    print(f"   Preprocessed from overview: {from_overview.shape}, "
+          f"mean abs difference vs full decode: {np.abs(from_overview - full).mean():.4f}")
+
+    cloud_detector = CloudDetector()
+    _, overview_pct = cloud_detector.detect_clouds_file(test_image_path, overviews=pyramid)
+    _, full_pct = cloud_detector.detect_clouds_file(test_image_path)
+    print(f"   Cloud % from overview: {overview_pct:.2f}, from full image: {full_pct:.2f}")
+
+    # GeoTIFF upload: internal overviews
+    print("\n📂 Ingesting GeoTIFF upload...")
+    rng = np.random.default_rng(0)
+    geotiff_path = os.path.join(tmp_dir, 'scene.tif')
+    with rasterio.open(geotiff_path, 'w', driver='GTiff', height=2048, width=2048, count=3, dtype='uint8',
+                       crs='EPSG:32643', transform=from_origin(600000, 3000000, 10, 10)) as dst:
+        dst.write(rng.integers(0, 255, size=(3, 2048, 2048), dtype=np.uint8))
+    pyramid.build(geotiff_path)
+    with rasterio.open(geotiff_path) as src:
+        print(f"   Internal overviews: {src.overviews(1)}")
+    level = pyramid.load(geotiff_path, 300)
+    print(f"   Level for 300 px consumers: {level.shape}")
+    assert level.shape == (512, 512, 3)
+
+    # Same file name in two folders, shared cache_dir: each gets its own levels
+    print("\n📂 Same name, different content...")
+    from PIL import Image
+    for folder, value in (('a', 0), ('b', 255)):
+        os.makedirs(os.path.join(tmp_dir, folder))
+        Image.new('RGB', (512, 512), (value,) * 3).save(os.path.join(tmp_dir, folder, 'upload.png'))
+        pyramid.build(os.path.join(tmp_dir, folder, 'upload.png'))
+    black = pyramid.load(os.path.join(tmp_dir, 'a', 'upload.png'), 64)
+    white = pyramid.load(os.path.join(tmp_dir, 'b', 'upload.png'), 64)
+    print(f"   a/upload.png level mean: {black.mean():.0f}, b/upload.png level mean: {white.mean():.0f}")
+    assert black.max() == 0 and white.min() == 255
+
+    # Re-upload under the same name: old levels are not served
+    Image.new('RGB', (512, 512), (128,) * 3).save(os.path.join(tmp_dir, 'a', 'upload.png'))
+    assert pyramid.load(os.path.join(tmp_dir, 'a', 'upload.png'), 64) is None
+
+    # Draft-decoded and overview pixels are separate preprocess cache entries
+    from utils.preprocess_cache import PreprocessCache
+    cache = PreprocessCache(os.path.join(tmp_dir, 'cache'))
+    draft_key = ImageProcessor(target_size=256, cache=cache, fast_decode=True)._cache_key(test_image_path)
+    overview_key = ImageProcessor(target_size=256, cache=cache, overviews=pyramid)._cache_key(test_image_path)
+    print(f"   Cache variants: {draft_key.rsplit('_', 1)[1]}, {overview_key.rsplit('_', 1)[1]}")
+    assert draft_key != overview_key
+
+    # Without fast_decode, no fitting level means a full (not draft) decode
+    no_level = ImageProcessor(target_size=4096, overviews=pyramid)
+    plain = ImageProcessor(target_size=4096)
+    assert np.array_equal(no_level.load_image(test_image_path, 4096), plain.load_image(test_image_path))
+
+    # 4-band uint16 Sentinel-2 stack (B2, B3, B4, B8), dark everywhere: levels are 8 bit RGB
+    print("\n📂 Ingesting a 16 bit 4-band GeoTIFF...")
+    s2_path = os.path.join(tmp_dir, 's2.tif')
+    with rasterio.open(s2_path, 'w', driver='GTiff', height=1024, width=1024, count=4, dtype='uint16',
+                       crs='EPSG:32643', transform=from_origin(600000, 3000000, 10, 10)) as dst:
+        dst.write(np.full((4, 1024, 1024), 3000, dtype=np.uint16))
+    pyramid.build(s2_path)
+    assert pyramid.load(s2_path, 256) is None  # no RGB mapping given: refused
+    s2_pyramid = OverviewPyramid(factors=(2, 4, 8), cache_dir=tmp_dir, bands=(3, 2, 1), max_value=10000)
+    level = s2_pyramid.load(s2_path, 256)
+    print(f"   Level: {level.shape} {level.dtype}, value {level.max()}")
+    assert level.dtype == np.uint8 and level.shape == (256, 256, 3) and level.max() == 76
+    s2_pre = ImageProcessor(target_size=256, overviews=s2_pyramid).preprocess_image(s2_path)
+    _, s2_cloud = cloud_detector.detect_clouds_file(s2_path, overviews=s2_pyramid)
+    print(f"   Preprocessed max: {s2_pre.max():.3f}, cloud %: {s2_cloud:.1f}")
+    assert s2_pre.max() <= 1.0 and s2_cloud == 0.0
+
+    shutil.rmtree(tmp_dir)
+    print("\n" + "=" * 70)
+    print("✅ OVERVIEW TESTING COMPLETE!")
+    print("=" * 70)
@@ -0,0 +1,74 @@
+"""
+Test persistent Vision AI response cache
+(uses a local stub model, no API key needed)
+"""
+
+import os
+import time
+import shutil
+import tempfile
+
+from models.vision_ai import VisionAI
+from models.response_cache import ResponseCache
+
+
+class StubModel:
+    """Counts calls, answers like Gemini"""
+    model_name = "stub-vision"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, contents):
+        self.calls += 1
+        return type("Response", (), {"text": "Yes, sand mining detected along the riverbank. High confidence. Severe."})()
+
+
+test_image_path = 'uploads/test_image.jpg'
+
+if not os.path.exists(test_image_path):
+    print("❌ Test image not found")
+else:
+    print("=" * 70)
+    print("🧪 TESTING RESPONSE CACHE - SEVAS")
+    print("=" * 70)
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, 'responses.sqlite')
+    stub = StubModel()
+    cache = ResponseCache(db_path)
+    vision_ai = VisionAI(model=stub, response_cache=cache)
+
+    first = vision_ai.analyze_with_gemini(test_image_path, detection_type="sand_mining")
+    second = vision_ai.analyze_with_gemini(test_image_path, detection_type="sand_mining")
+    print(f"\n📦 Model calls after two identical analyses: {stub.calls}")
+    print(f"   Hits: {cache.hits}, misses: {cache.misses}")
+    assert stub.calls == 1 and first == second
+
+    # a different prompt is a different request
+    vision_ai.analyze_with_gemini(test_image_path, detection_type="vegetation")
+    assert stub.calls == 2
+
+    # the batch path shares the cache, and the cache survives a restart
+    cache.close()
+    cache = ResponseCache(db_path)
+    vision_ai = VisionAI(model=stub, response_cache=cache)
+    results = vision_ai.analyze_batch([test_image_path] * 3, detection_type="sand_mining")
+    print(f"\n📦 Model calls after batch on reopened cache: {stub.calls}")
+    assert stub.calls == 2 and all(r == first for r in results)
+
+    # expired entries are ignored, max_entries is enforced
+    cache.ttl_seconds = 0.01
+    time.sleep(0.05)
+    vision_ai.analyze_with_gemini(test_image_path, detection_type="sand_mining")
+    assert stub.calls == 3
+    cache.max_entries = 1
+    cache.evict()
+    print(f"   Entries after shrinking to max_entries=1: {len(cache)}")
+    assert len(cache) == 1
+
+    cache.close()
+    shutil.rmtree(tmp_dir)
+    print("\n" + "=" * 70)
+    print("✅ RESPONSE CACHE TESTING COMPLETE!")
+    print("=" * 70)
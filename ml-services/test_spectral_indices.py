@@ -5,6 +5,7 @@ Test spectral indices calculation
 from utils.image_processor import ImageProcessor
 from utils.spectral_indices import SpectralIndices
 import cv2
+import numpy as np
 import os
 
 processor = ImageProcessor(target_size=256)
@@ -48,6 +49,23 @@ else:
                 colormap=cv2.COLORMAP_OCEAN
             )
         
+        # Index engine with the same band mapping calculate_ndvi uses on RGB input
+        channel0, channel1, _ = spectral.extract_rgb_bands(img_resized)
+        indices, stats = spectral.calculate_indices(
+            {"red": channel0, "nir": channel1}, indices=("ndvi",)
+        )
+        if indices is not None:
+            print(f"   Matches calculate_ndvi: {np.array_equal(indices['ndvi'], ndvi)}")
+
+        # All indices in one call on a multispectral stack (simulated 5-band scene)
+        rng = np.random.default_rng(0)
+        band_stack = rng.integers(0, 10000, size=(256, 256, 5), dtype=np.uint16)
+        indices, stats = spectral.calculate_indices(
+            band_stack,
+            indices=tuple(SpectralIndices.INDEX_FORMULAS),
+            band_order=("blue", "green", "red", "nir", "swir1")
+        )
+
         print("\n" + "=" * 70)
         print("✅ TESTING COMPLETE!")
         print("Check outputs/ folder for:")
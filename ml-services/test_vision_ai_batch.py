@@ -0,0 +1,123 @@
+"""
+Test batch Vision AI analysis against a local stub model
+(no API key needed, latency and failures are simulated)
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+from google.api_core import exceptions as api_exceptions
+
+from models.vision_ai import VisionAI
+
+
+class StubModel:
+    """
+    Answers like Gemini after `delay` seconds, with scripted failures per image
+    Calls for `hang` images take hang_seconds, or fail with DeadlineExceeded
+    once the per-request timeout passed in by VisionAI runs out
+    """
+
+    def __init__(self, delay=0.05, failures=None, hang=(), hang_seconds=30.0):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.hang = set(hang)
+        self.hang_seconds = hang_seconds
+        self.timeouts = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, timeout=None):
+        prompt, img = contents
+        name = os.path.basename(img.filename)
+        # hung calls count too: timed out calls keep running in the SDK
+        with self._lock:
+            self.timeouts.add(timeout)
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures.get(name, 0)
+            if fail:
+                self.failures[name] = fail - 1
+        try:
+            if name in self.hang:
+                if timeout is None or timeout >= self.hang_seconds:
+                    time.sleep(self.hang_seconds)
+                else:
+                    time.sleep(timeout)
+                    raise api_exceptions.DeadlineExceeded("stub deadline exceeded")
+            else:
+                time.sleep(self.delay)
+            if fail:
+                raise api_exceptions.ServiceUnavailable("stub overloaded")
+            return type("Response", (), {"text": f"Image {name}: no violations detected. Normal land use."})()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+test_image_path = 'uploads/test_image.jpg'
+
+if not os.path.exists(test_image_path):
+    print("❌ Test image not found")
+else:
+    print("=" * 70)
+    print("🧪 TESTING BATCH VISION AI - SEVAS")
+    print("=" * 70)
+
+    # 12 "tiles" (links to the same upload so every one has its own name)
+    tmp_dir = tempfile.mkdtemp()
+    paths = []
+    for i in range(12):
+        path = os.path.join(tmp_dir, f"tile_{i:02d}.jpg")
+        os.symlink(os.path.abspath(test_image_path), path)
+        paths.append(path)
+    paths.append(os.path.join(tmp_dir, "missing.jpg"))
+
+    stub = StubModel(delay=0.1, failures={"tile_03.jpg": 2}, hang={"tile_07.jpg"})
+    vision_ai = VisionAI(model=stub, max_concurrency=4, requests_per_second=20,
+                         max_retries=2, request_timeout=0.5, backoff=0.05)
+
+    start = time.perf_counter()
+    results = vision_ai.analyze_batch(paths, detection_type="sand_mining")
+    elapsed = time.perf_counter() - start
+
+    print(f"\n📊 {len(results)} results in {elapsed:.2f}s, "
+          f"{stub.calls} model calls, max in flight {stub.max_in_flight}")
+    for path, result in zip(paths, results):
+        name = os.path.basename(path)
+        if result.get("error"):
+            print(f"   {name}: error {result['error']}")
+        else:
+            assert name in result["raw_response"]  # input order kept
+    assert len(results) == len(paths)
+    assert stub.max_in_flight <= 4
+    assert not results[3].get("error")      # recovered after 2 retries
+    assert results[7].get("error")          # timed out on every attempt
+    assert results[-1].get("error")         # missing file
+    assert sum(1 for r in results if r.get("error")) == 2
+    assert stub.timeouts == {0.5}           # every call got the per-request timeout
+
+    # A model without a timeout parameter that hangs must not hang the batch
+    class NoTimeoutModel(StubModel):
+        def generate_content(self, contents):
+            return super().generate_content(contents)
+
+    stuck = NoTimeoutModel(delay=0.05, hang={"tile_01.jpg"}, hang_seconds=4.0)
+    vision_ai = VisionAI(model=stuck, max_concurrency=2, requests_per_second=20,
+                         max_retries=0, request_timeout=0.5, backoff=0.05)
+    start = time.perf_counter()
+    results = vision_ai.analyze_batch(paths[:3], detection_type="sand_mining")
+    elapsed = time.perf_counter() - start
+    print(f"   Batch with a never-ending call returned after {elapsed:.2f}s")
+    assert results[1].get("error") and not results[0].get("error") and elapsed < 2.5
+    assert stuck.max_in_flight <= 2
+    shutil.rmtree(tmp_dir)
+
+    print("\n" + "=" * 70)
+    print("✅ BATCH VISION AI TESTING COMPLETE!")
+    print("=" * 70)
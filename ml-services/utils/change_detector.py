@@ -1,12 +1,23 @@
 
 import numpy as np
 import cv2
+from utils.sampling import wilson_interval
+from utils.cloud_detector import CloudDetector
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 class ChangeDetector:
     """
     Detects changes between two temporal images
     Useful for tracking sand mining, deforestation, construction
     """
+
+    CHANGE_DESCRIPTIONS = {
+        "vegetation_loss": "Possible deforestation or land clearing",
+        "construction": "Possible new construction or excavation",
+        "water_increase": "Possible flooding or water accumulation",
+        "general_change": "Land use change detected"
+    }
     
     def __init__(self, change_threshold=50):
         """
@@ -37,15 +48,9 @@ class ChangeDetector:
         print("\n Detecting changes between images...")
         
         try:
-            # Make copies
-            img1 = image_before.copy()
-            img2 = image_after.copy()
-            
-            # Ensure both images are in 0-255 range
-            if img1.max() <= 1.0:
-                img1 = (img1 * 255).astype(np.uint8)
-            if img2.max() <= 1.0:
-                img2 = (img2 * 255).astype(np.uint8)
+            # Ensure both images are in 0-255 range (inputs are never modified, no copies needed)
+            img1 = self._to_uint8_range(image_before)
+            img2 = self._to_uint8_range(image_after)
             
             # Check if images have same shape
             if img1.shape != img2.shape:
@@ -54,22 +59,11 @@ class ChangeDetector:
                 print(f"   Resizing 'after' image to match 'before'...")
                 img2 = cv2.resize(img2, (img1.shape[1], img1.shape[0]))
             
-            # Calculate absolute difference
-            # For RGB images, calculate difference for each channel
-            if len(img1.shape) == 3:
-                # Calculate per-channel difference
-                diff_r = np.abs(img1[:, :, 2].astype(np.float32) - img2[:, :, 2].astype(np.float32))
-                diff_g = np.abs(img1[:, :, 1].astype(np.float32) - img2[:, :, 1].astype(np.float32))
-                diff_b = np.abs(img1[:, :, 0].astype(np.float32) - img2[:, :, 0].astype(np.float32))
-                
-                # Average difference across channels
-                difference = (diff_r + diff_g + diff_b) / 3.0
-            else:
-                # Grayscale image
-                difference = np.abs(img1.astype(np.float32) - img2.astype(np.float32))
+            difference_sum, channels = self._difference_sum(img1, img2)
             
             # Create change mask (binary: changed or not)
-            change_mask = (difference > self.change_threshold).astype(np.uint8)
+            # mean difference > threshold, checked on the channel sum
+            change_mask = (difference_sum > channels * self.change_threshold).astype(np.uint8)
             
             # Calculate change percentage
             total_pixels = int(change_mask.size)
@@ -80,8 +74,8 @@ class ChangeDetector:
             print(f"   - Total pixels: {total_pixels:,}")
             print(f"   - Changed pixels: {changed_pixels:,}")
             print(f"   - Change percentage: {change_percentage:.2f}%")
-            print(f"   - Max difference: {difference.max():.1f}")
-            print(f"   - Mean difference: {difference.mean():.1f}")
+            print(f"   - Max difference: {difference_sum.max() / channels:.1f}")
+            print(f"   - Mean difference: {difference_sum.mean() / channels:.1f}")
             
             # Interpret results
             if change_percentage < 5:
@@ -91,7 +85,11 @@ class ChangeDetector:
             else:
                 print(f"   ⚠️  Significant change detected ({change_percentage:.1f}%)")
             
-            return change_mask, change_percentage, difference.astype(np.uint8)
+            if channels > 1:
+                difference = (difference_sum // channels).astype(np.uint8)
+            else:
+                difference = difference_sum.astype(np.uint8)
+            return change_mask, change_percentage, difference
             
         except Exception as e:
             print(f"❌ Error detecting changes: {str(e)}")
@@ -99,6 +97,382 @@ class ChangeDetector:
             traceback.print_exc()
             return None, 0.0, None
     
+    def _to_uint8_range(self, image):
+        # uint8 is already 0-255: no copy and no max() scan
+        if image.dtype == np.uint8:
+            return image
+        if image.max() <= 1.0:
+            return (image * 255).astype(np.uint8)
+        return image
+
+    def _difference_sum(self, img1, img2):
+        """
+        Channel sum of |img1 - img2| and the number of channels summed
+
+        mean difference = sum / channels, and changed = sum > channels x threshold.
+        uint8 BGR / grayscale pairs use an integer-only kernel (saturating cv2.absdiff
+        + uint16 channel sum) that gives the same masks as the float32 path
+        without its six per-channel float copies.
+        """
+        if img1.dtype == np.uint8 and img2.dtype == np.uint8:
+            if img1.ndim == 2:
+                return cv2.absdiff(img1, img2), 1
+            if img1.ndim == 3 and img1.shape[2] == 3:
+                diff = cv2.absdiff(img1, img2)
+                total = diff[:, :, 0].astype(np.uint16)
+                total += diff[:, :, 1]
+                total += diff[:, :, 2]
+                return total, 3
+        # float path: already the channel mean
+        return self._compute_difference(img1, img2), 1
+
+    def _compute_difference(self, img1, img2):
+        """Mean absolute difference across channels (float32, same shape as one channel)"""
+        # Calculate absolute difference
+        # For RGB images, calculate difference for each channel
+        if len(img1.shape) == 3:
+            # Calculate per-channel difference
+            diff_r = np.abs(img1[:, :, 2].astype(np.float32) - img2[:, :, 2].astype(np.float32))
+            diff_g = np.abs(img1[:, :, 1].astype(np.float32) - img2[:, :, 1].astype(np.float32))
+            diff_b = np.abs(img1[:, :, 0].astype(np.float32) - img2[:, :, 0].astype(np.float32))
+            
+            # Average difference across channels
+            return (diff_r + diff_g + diff_b) / 3.0
+        # Grayscale image
+        return np.abs(img1.astype(np.float32) - img2.astype(np.float32))
+
+    def detect_changes_tiled(self, before_path, after_path, mask_path, block_size=1024,
+                             num_workers=4, bands=None, max_value=None):
+        """
+        detect_changes for two co-registered full scenes, tile by tile
+
+        Matching windows are read from both rasters, the diff/threshold runs per
+        tile on a thread pool and the mask is written into a GeoTIFF as tiles
+        finish. Only a few tiles are in memory at once.
+
+        Args:
+            before_path (str): Earlier GeoTIFF
+            after_path (str): Later GeoTIFF, same size and grid as before_path
+            mask_path (str): Output change mask GeoTIFF (uint8, 1=changed)
+            block_size (int): Tile height/width in pixels
+            num_workers (int): Threads processing tiles
+            bands (tuple): 1-based bands to compare (e.g. (3, 2, 1) for RGB -> BGR)
+            max_value: Full scale of the data (e.g. 10000 for Sentinel-2 L2A); needed
+                       for uint16 / int rasters, whose digital numbers are not on the
+                       0-255 scale change_threshold is set for (see CloudDetector.scene_scale)
+
+        Returns:
+            dict: change_percentage, changed_pixels, total_pixels,
+                  max_difference, mean_difference (None on error)
+        """
+        import rasterio
+        from utils.raster_reader import RasterReader
+
+        print("\n Detecting changes tile by tile...")
+
+        try:
+            with RasterReader(before_path, block_size=block_size, bands=bands) as before, \
+                    RasterReader(after_path, block_size=block_size, bands=bands) as after:
+                # no resizing here: full scenes must already be co-registered
+                if (before.width, before.height) != (after.width, after.height):
+                    raise ValueError(f"Scenes differ in size: {before.width}x{before.height} "
+                                     f"vs {after.width}x{after.height}")
+                if len(before.bands) != len(after.bands):
+                    raise ValueError("Scenes have a different number of bands")
+
+                # decide scaling once per scene, a dark tile must not be rescaled on its own;
+                # >8 bit integer rasters without max_value are refused (ValueError)
+                before_scale = CloudDetector.raster_scale(before, max_value)
+                after_scale = CloudDetector.raster_scale(after, max_value)
+
+                def compare(data1, data2):
+                    data1 = CloudDetector.to_byte_range(data1, before_scale)
+                    data2 = CloudDetector.to_byte_range(data2, after_scale)
+                    if data1.shape[2] == 1:
+                        data1, data2 = data1[:, :, 0], data2[:, :, 0]
+                    difference_sum, channels = self._difference_sum(data1, data2)
+                    mask = (difference_sum > channels * self.change_threshold).astype(np.uint8)
+                    return mask, int(np.count_nonzero(mask)), \
+                        float(difference_sum.sum(dtype=np.float64)) / channels, \
+                        float(difference_sum.max()) / channels
+
+                profile = before.profile.copy()
+                profile.update(driver='GTiff', count=1, dtype='uint8', nodata=None, compress='deflate')
+                if before.width >= 256 and before.height >= 256:
+                    profile.update(tiled=True, blockxsize=256, blockysize=256)
+                else:
+                    profile.update(tiled=False)
+                    profile.pop('blockxsize', None)
+                    profile.pop('blockysize', None)
+
+                changed_pixels = 0
+                difference_sum = 0.0
+                max_difference = 0.0
+                total_pixels = before.width * before.height
+
+                with rasterio.open(mask_path, 'w', **profile) as dst, \
+                        ThreadPoolExecutor(max_workers=max(1, num_workers)) as pool:
+                    pending = deque()
+
+                    def write_oldest():
+                        nonlocal changed_pixels, difference_sum, max_difference
+                        window, future = pending.popleft()
+                        mask, changed, diff_sum, diff_max = future.result()
+                        dst.write(mask, 1, window=window)
+                        changed_pixels += changed
+                        difference_sum += diff_sum
+                        max_difference = max(max_difference, diff_max)
+
+                    for _, _, window in before.windows():
+                        pending.append((window, pool.submit(
+                            compare, before.read_window(window), after.read_window(window))))
+                        # bound tiles in flight so memory stays constant
+                        if len(pending) >= max(1, num_workers) * 2:
+                            write_oldest()
+                    while pending:
+                        write_oldest()
+
+            change_percentage = (changed_pixels / total_pixels) * 100.0
+            print(f"   Change statistics:")
+            print(f"   - Total pixels: {total_pixels:,}")
+            print(f"   - Changed pixels: {changed_pixels:,}")
+            print(f"   - Change percentage: {change_percentage:.2f}%")
+            print(f"   - Max difference: {max_difference:.1f}")
+            print(f"   - Mean difference: {difference_sum / total_pixels:.1f}")
+            print(f"   Mask saved to: {mask_path}")
+
+            return {
+                "change_percentage": change_percentage,
+                "changed_pixels": changed_pixels,
+                "total_pixels": total_pixels,
+                "max_difference": max_difference,
+                "mean_difference": difference_sum / total_pixels
+            }
+
+        except Exception as e:
+            print(f"❌ Error detecting changes by tile: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def detect_changes_stack(self, image_stack):
+        """
+        Change detection over a whole time series in one call
+
+        Each date is brought to 0-255 on its own, as detect_changes does; the
+        stack is then converted once (int16 when every date is uint8, float32
+        otherwise) and every consecutive pair and every date against the first
+        one are diffed in vectorized passes along the time axis. Masks match
+        detect_changes on the same pair (mean difference of the first 3 channels
+        > threshold, single-channel stacks are compared as grayscale).
+
+        Args:
+            image_stack (numpy.ndarray): (T, H, W, C) with C = 1 or C >= 3 (only the
+                                         first 3 are used, like detect_changes), or
+                                         (T, H, W); 0-255 or 0-1, decided per date
+
+        Returns:
+            dict:
+                - consecutive_masks: (T-1, H, W) uint8, date t vs date t-1
+                - baseline_masks: (T-1, H, W) uint8, date t vs date 0
+                - consecutive_percentages: (T-1,) changed % per consecutive pair
+                - baseline_percentages: (T-1,) changed % vs the first date
+                - first_change: (H, W) int, first date index that differs from
+                  date 0, -1 where the pixel never changed
+        """
+        print(f"\n Detecting changes over {len(image_stack)} dates...")
+
+        try:
+            if image_stack.ndim not in (3, 4) or len(image_stack) < 2:
+                raise ValueError("Expected a (T, H, W, C) or (T, H, W) stack with T >= 2")
+
+            stack = image_stack
+            if stack.ndim == 4:
+                if stack.shape[3] == 1:
+                    stack = stack[..., 0]
+                elif stack.shape[3] >= 3:
+                    stack = stack[..., :3]
+                else:
+                    raise ValueError(f"Expected 1 or at least 3 channels, got {stack.shape[3]}")
+            dates = [self._to_uint8_range(date) for date in stack]
+            integer = all(date.dtype == np.uint8 for date in dates)
+            # uint8 stacks stay in integers; floats are not truncated, like detect_changes' float path
+            stack = np.stack(dates).astype(np.int16 if integer else np.float32)
+            del dates
+
+            def masks(later, earlier):
+                difference = np.abs(later - earlier)
+                if difference.ndim == 3:
+                    return difference > self.change_threshold
+                if integer:
+                    # channel sum instead of mean keeps everything in integers
+                    return difference.sum(axis=3, dtype=np.int16) > 3 * self.change_threshold
+                # same channel order and mean as _compute_difference
+                mean = (difference[..., 2] + difference[..., 1] + difference[..., 0]) / 3.0
+                return mean > self.change_threshold
+
+            consecutive = masks(stack[1:], stack[:-1])
+            baseline = masks(stack[1:], stack[:1])
+
+            pixels_per_date = consecutive[0].size
+            consecutive_pct = consecutive.reshape(len(consecutive), -1).sum(axis=1) / pixels_per_date * 100.0
+            baseline_pct = baseline.reshape(len(baseline), -1).sum(axis=1) / pixels_per_date * 100.0
+
+            # argmax finds the first True along time, pixels with none get -1
+            first_change = np.argmax(baseline, axis=0).astype(np.int32) + 1
+            first_change[~baseline.any(axis=0)] = -1
+
+            print(f"   Change % per consecutive pair: {np.round(consecutive_pct, 2).tolist()}")
+            print(f"   Change % vs first date: {np.round(baseline_pct, 2).tolist()}")
+            print(f"   Pixels changed at some date: {(first_change >= 0).mean() * 100:.2f}%")
+
+            return {
+                "consecutive_masks": consecutive.astype(np.uint8),
+                "baseline_masks": baseline.astype(np.uint8),
+                "consecutive_percentages": consecutive_pct,
+                "baseline_percentages": baseline_pct,
+                "first_change": first_change
+            }
+
+        except Exception as e:
+            print(f"❌ Error detecting changes over stack: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def detect_changes_pyramid(self, image_before, image_after, factor=8, block_size=64,
+                               coarse_ratio=0.5, sample_size=None, confidence=0.95):
+        """
+        Coarse-to-fine detect_changes: full-resolution work only where needed
+
+        Both images are shrunk by `factor` (area averaging) and diffed. Blocks
+        of the full-resolution image are refined only if a coarse pixel over them
+        differs by more than coarse_ratio x threshold (averaging dilutes small
+        changes, hence the lower bar). Unflagged blocks are reported unchanged,
+        so very small changes inside otherwise unchanged blocks can be missed.
+
+        Args:
+            image_before, image_after: Images as for detect_changes
+            factor (int): Downscale factor of the coarse level
+            block_size (int): Refinement block size (rounded up to a multiple of factor)
+            coarse_ratio (float): Fraction of change_threshold that flags a coarse pixel
+            sample_size (int): If set, also return a sampled estimate (estimate_change_percentage)
+            confidence (float): Confidence level for that estimate
+
+        Returns:
+            tuple: (change_mask, change_percentage, details)
+                - details: refined_blocks, total_blocks, refined_fraction
+                  and "estimate" when sample_size is given
+        """
+        print("\n Detecting changes coarse-to-fine...")
+
+        try:
+            img1 = self._to_uint8_range(image_before)
+            img2 = self._to_uint8_range(image_after)
+            if img1.shape != img2.shape:
+                print(f"   Resizing 'after' image to match 'before'...")
+                img2 = cv2.resize(img2, (img1.shape[1], img1.shape[0]))
+
+            height, width = img1.shape[:2]
+            block_size = max(factor, -(-block_size // factor) * factor)
+            coarse_size = (max(1, width // factor), max(1, height // factor))
+
+            coarse1 = cv2.resize(img1, coarse_size, interpolation=cv2.INTER_AREA)
+            coarse2 = cv2.resize(img2, coarse_size, interpolation=cv2.INTER_AREA)
+            flagged = self._compute_difference(coarse1, coarse2) > self.change_threshold * coarse_ratio
+            # grow by one coarse pixel so changes on a border are not cut off
+            flagged = cv2.dilate(flagged.astype(np.uint8), np.ones((3, 3), np.uint8)) > 0
+
+            grid_rows = -(-height // block_size)
+            grid_cols = -(-width // block_size)
+            ys, xs = np.nonzero(flagged)
+            block_flags = np.zeros((grid_rows, grid_cols), dtype=bool)
+            block_flags[np.minimum(ys * factor // block_size, grid_rows - 1),
+                        np.minimum(xs * factor // block_size, grid_cols - 1)] = True
+            # the coarse level drops the last width % factor columns / rows, always refine those
+            if width % factor:
+                block_flags[:, -1] = True
+            if height % factor:
+                block_flags[-1, :] = True
+
+            change_mask = np.zeros((height, width), dtype=np.uint8)
+            for row, col in zip(*np.nonzero(block_flags)):
+                rows = slice(row * block_size, (row + 1) * block_size)
+                cols = slice(col * block_size, (col + 1) * block_size)
+                difference_sum, channels = self._difference_sum(img1[rows, cols], img2[rows, cols])
+                change_mask[rows, cols] = difference_sum > channels * self.change_threshold
+
+            changed_pixels = int(np.count_nonzero(change_mask))
+            change_percentage = (changed_pixels / change_mask.size) * 100.0
+            refined = int(block_flags.sum())
+            details = {
+                "refined_blocks": refined,
+                "total_blocks": int(block_flags.size),
+                "refined_fraction": refined / block_flags.size
+            }
+
+            print(f"   Refined blocks: {refined}/{block_flags.size} ({details['refined_fraction'] * 100:.1f}%)")
+            print(f"   - Change percentage: {change_percentage:.2f}%")
+
+            if sample_size:
+                details["estimate"] = self.estimate_change_percentage(
+                    img1, img2, sample_size=sample_size, confidence=confidence)
+
+            return change_mask, change_percentage, details
+
+        except Exception as e:
+            print(f"❌ Error detecting changes coarse-to-fine: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None, 0.0, None
+
+    def estimate_change_percentage(self, image_before, image_after, sample_size=10000,
+                                   confidence=0.95, seed=None):
+        """
+        Approximate change percentage from a random pixel sample
+
+        Only sample_size pixels are diffed; the error bound is a Wilson score
+        interval, so it stays sensible for very small or very large changes.
+
+        Args:
+            image_before, image_after: Images as for detect_changes (same shape)
+            sample_size (int): Pixels to sample
+            confidence (float): Confidence level of the interval
+            seed (int): Random seed for reproducible samples
+
+        Returns:
+            dict: estimate, low, high (all in %), margin (half width), sample_size
+        """
+        height, width = image_before.shape[:2]
+        total = height * width
+        sample_size = int(min(sample_size, total))
+        rng = np.random.default_rng(seed)
+        index = rng.choice(total, size=sample_size, replace=False) if sample_size < total else np.arange(total)
+        rows, cols = np.divmod(index, width)
+
+        # gather the sampled pixels as a (n, 1[, C]) strip and reuse the usual diff
+        pixels1 = image_before[rows, cols][:, None]
+        pixels2 = image_after[rows, cols][:, None]
+        # only float images can be in 0-1, skip the full max() scan for uint8
+        if pixels1.dtype.kind == 'f' and image_before.max() <= 1.0:
+            pixels1 = (pixels1 * 255).astype(np.uint8)
+        if pixels2.dtype.kind == 'f' and image_after.max() <= 1.0:
+            pixels2 = (pixels2 * 255).astype(np.uint8)
+        changed = int(np.count_nonzero(self._compute_difference(pixels1, pixels2) > self.change_threshold))
+
+        low, high = wilson_interval(changed, sample_size, confidence)
+
+        estimate = {
+            "estimate": changed / sample_size * 100.0,
+            "low": low * 100.0,
+            "high": high * 100.0,
+            "margin": (high - low) / 2 * 100.0,
+            "sample_size": sample_size
+        }
+        print(f"   Sampled change estimate: {estimate['estimate']:.2f}% "
+              f"({estimate['low']:.2f}-{estimate['high']:.2f}% at {confidence:.0%})")
+        return estimate
+
     def visualize_changes(self, image_before, image_after, change_mask, output_path):
         """
         Create side-by-side visualization with changes highlighted
@@ -112,14 +486,9 @@ class ChangeDetector:
         try:
             print("\n🎨 Creating change visualization...")
             
-            # Prepare images
-            img1 = image_before.copy()
-            img2 = image_after.copy()
-            
-            if img1.max() <= 1.0:
-                img1 = (img1 * 255).astype(np.uint8)
-            if img2.max() <= 1.0:
-                img2 = (img2 * 255).astype(np.uint8)
+            # Prepare images (read only, no copies needed)
+            img1 = self._to_uint8_range(image_before)
+            img2 = self._to_uint8_range(image_after)
             
             # Ensure change_mask is 2D
             if len(change_mask.shape) > 2:
@@ -207,16 +576,13 @@ class ChangeDetector:
             
             if green_change < -30:
                 analysis["type"] = "vegetation_loss"
-                analysis["description"] = "Possible deforestation or land clearing"
             elif brightness_change > 30:
                 analysis["type"] = "construction"
-                analysis["description"] = "Possible new construction or excavation"
             elif brightness_change < -30:
                 analysis["type"] = "water_increase"
-                analysis["description"] = "Possible flooding or water accumulation"
             else:
                 analysis["type"] = "general_change"
-                analysis["description"] = "Land use change detected"
+            analysis["description"] = self.CHANGE_DESCRIPTIONS[analysis["type"]]
             
             print(f"   Change type: {analysis['type']}")
             print(f"   Description: {analysis['description']}")
@@ -227,4 +593,97 @@ class ChangeDetector:
             
         except Exception as e:
             print(f" Error analyzing change type: {str(e)}")
-            return {"type": "unknown", "confidence": 0}
\ No newline at end of file
+            return {"type": "unknown", "confidence": 0}
+
+    def extract_change_regions(self, change_mask, image_before, image_after, min_area=1, connectivity=8):
+        """
+        Split a change mask into connected regions and describe each one
+
+        All per-region statistics come from one vectorized pass (bincount over
+        the label image), so thousands of regions cost about the same as one.
+
+        Args:
+            change_mask: Binary mask from detect_changes
+            image_before: Earlier image (0-255 or 0-1)
+            image_after: Later image (0-255 or 0-1)
+            min_area (int): Drop regions smaller than this many pixels
+            connectivity (int): 4 or 8 neighbour connectivity
+
+        Returns:
+            list: One dict per region, largest first:
+                id, bbox (x, y, w, h), area, centroid (x, y),
+                mean_before, mean_after (per channel), green_change,
+                brightness_change, type, description
+        """
+        print("\n🧩 Extracting change regions...")
+
+        try:
+            if len(change_mask.shape) > 2:
+                change_mask = change_mask[:, :, 0]
+            mask = (change_mask > 0).astype(np.uint8)
+
+            num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+                mask, connectivity=connectivity
+            )
+            if num_labels <= 1:
+                print("   No change regions found")
+                return []
+
+            img1 = self._to_uint8_range(image_before)
+            img2 = self._to_uint8_range(image_after)
+            if img1.ndim == 2:
+                img1 = img1[:, :, None]
+                img2 = img2[:, :, None]
+
+            # per-region channel sums in one pass per channel
+            flat_labels = labels.ravel()
+            areas = stats[:, cv2.CC_STAT_AREA].astype(np.float64)
+            channels = img1.shape[2]
+            mean_before = np.empty((num_labels, channels))
+            mean_after = np.empty((num_labels, channels))
+            for ch in range(channels):
+                mean_before[:, ch] = np.bincount(
+                    flat_labels, weights=img1[:, :, ch].ravel(), minlength=num_labels) / areas
+                mean_after[:, ch] = np.bincount(
+                    flat_labels, weights=img2[:, :, ch].ravel(), minlength=num_labels) / areas
+
+            # same heuristics as analyze_change_type, for every region at once
+            green = 1 if channels > 1 else 0
+            green_change = mean_after[:, green] - mean_before[:, green]
+            brightness_change = mean_after.mean(axis=1) - mean_before.mean(axis=1)
+            change_types = np.select(
+                [green_change < -30, brightness_change > 30, brightness_change < -30],
+                ["vegetation_loss", "construction", "water_increase"],
+                default="general_change"
+            )
+
+            keep = np.flatnonzero(stats[:, cv2.CC_STAT_AREA] >= min_area)
+            keep = keep[keep != 0]  # label 0 is the unchanged background
+            keep = keep[np.argsort(-stats[keep, cv2.CC_STAT_AREA], kind='stable')]
+
+            regions = []
+            for label in keep:
+                x, y, w, h, area = (int(v) for v in stats[label])
+                regions.append({
+                    "id": int(label),
+                    "bbox": (x, y, w, h),
+                    "area": area,
+                    "centroid": (float(centroids[label][0]), float(centroids[label][1])),
+                    "mean_before": mean_before[label].tolist(),
+                    "mean_after": mean_after[label].tolist(),
+                    "green_change": float(green_change[label]),
+                    "brightness_change": float(brightness_change[label]),
+                    "type": str(change_types[label]),
+                    "description": self.CHANGE_DESCRIPTIONS[str(change_types[label])]
+                })
+
+            print(f"   Regions found: {num_labels - 1:,}, kept (area >= {min_area}): {len(regions):,}")
+            if regions:
+                print(f"   Largest region: {regions[0]['area']:,} px, type {regions[0]['type']}")
+            return regions
+
+        except Exception as e:
+            print(f" Error extracting change regions: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return []
@@ -1,5 +1,8 @@
 import numpy as np
 import cv2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.sampling import wilson_interval
 
 class CloudDetector:
     def __init__(self,brightness_threshold=200,cloud_threshold_percent=30):
@@ -19,22 +22,11 @@ class CloudDetector:
             if img.max() <= 1.0:
                 img = (img * 255).astype(np.uint8)
 
-            if len(img.shape) == 3:
-                red = img[:, :, 2]
-                green = img[:, :, 1]
-                blue = img[:, :, 0]
-            else:
+            if len(img.shape) != 3:
                 print("check point image is not in expected format")
                 return None, 0.0
 
-            # detection logic
-            red_bright = red > self.brightness_threshold
-            green_bright = green > self.brightness_threshold
-            blue_bright = blue > self.brightness_threshold
-
-            # a pixel is cloud when all channels are bright
-            cloud_mask = red_bright & green_bright & blue_bright
-            cloud_mask = cloud_mask.astype(np.uint8)
+            cloud_mask = self._cloud_mask(img)
 
             total_pixels = int(cloud_mask.size)
             cloud_pixels = int(np.sum(cloud_mask))
@@ -59,6 +51,307 @@ class CloudDetector:
             traceback.print_exc()
             return None, 0.0
         
+    def _cloud_mask(self, img):
+        red = img[:, :, 2]
+        green = img[:, :, 1]
+        blue = img[:, :, 0]
+
+        # detection logic
+        red_bright = red > self.brightness_threshold
+        green_bright = green > self.brightness_threshold
+        blue_bright = blue > self.brightness_threshold
+
+        # a pixel is cloud when all channels are bright
+        cloud_mask = red_bright & green_bright & blue_bright
+        return cloud_mask.astype(np.uint8)
+
+    def detect_clouds_file(self, image_path, overviews=None, screening_size=512):
+        # cloud check straight from a file; with an OverviewPyramid the smallest
+        # level >= screening_size is read instead of the full-resolution upload
+        print(f"check point detecting clouds in {image_path}")
+        try:
+            img = overviews.load(image_path, screening_size) if overviews is not None else None
+            if img is None:
+                from PIL import Image
+                img = np.array(Image.open(image_path).convert('RGB'))
+            # all three channels must be bright, so RGB vs BGR order does not matter
+            return self.detect_clouds(img)
+        except Exception as e:
+            print(f"Error reading image for cloud detection: {e}")
+            return None, 0.0
+
+    @staticmethod
+    def scene_scale(sample, max_value=None):
+        """
+        Factor that brings a scene to the 0-255 range brightness_threshold is set for
+        Decide it once per scene, so every block / chunk of the scene is treated alike
+
+        Args:
+            sample: The scene or a decimated read of all of it (see raster_scale);
+                    never a single block, a dark or nodata block says nothing about the scene
+            max_value: Full-scale value of integer data wider than 8 bit
+                       (e.g. 10000 for Sentinel-2 L2A reflectance)
+
+        Returns:
+            float: Multiplier (1.0 = already 0-255)
+
+        Raises:
+            ValueError: uint16 / int data without max_value, its range cannot be guessed
+        """
+        if max_value is not None:
+            return 255.0 / max_value
+        if sample.dtype == np.uint8:
+            return 1.0
+        if sample.dtype.kind == 'f':
+            # same rule as detect_clouds: float data with max <= 1 is 0-1
+            return 255.0 if np.nanmax(sample) <= 1.0 else 1.0
+        raise ValueError(f"{sample.dtype} data needs max_value (sensor full scale) to be scaled to 0-255")
+
+    @staticmethod
+    def raster_scale(reader, max_value=None, max_side=1024):
+        """
+        scene_scale for a whole raster (RasterReader)
+        Float rasters without max_value are judged from one decimated read of the
+        full scene, so the decision never hangs on the first block
+
+        Returns:
+            float: Multiplier (1.0 = already 0-255)
+        """
+        dtype = np.dtype(reader.dataset.dtypes[reader.bands[0] - 1])
+        if dtype.kind == 'f' and max_value is None:
+            return CloudDetector.scene_scale(reader.read_overview(max_side), max_value)
+        return CloudDetector.scene_scale(np.zeros(1, dtype=dtype), max_value)
+
+    @staticmethod
+    def to_byte_range(img, scale):
+        """Apply a scene_scale factor (data that is already 0-255 is returned as is)"""
+        if scale == 1.0:
+            return img
+        # clipped, so values above the assumed range saturate instead of wrapping around
+        return np.clip(img * scale, 0, 255).astype(np.uint8)
+
+    def cloud_mask(self, img, scale=1.0):
+        """
+        Boolean cloud mask for an image or a stack of images (..., H, W, C)
+
+        Args:
+            img: Pixels, channel order as detect_clouds expects
+            scale: scene_scale factor of the scene the pixels come from
+
+        Returns:
+            numpy.ndarray: (..., H, W) bool, True where all 3 channels are bright
+        """
+        return (self.to_byte_range(img, scale)[..., :3] > self.brightness_threshold).all(axis=-1)
+
+    def detect_clouds_blocks(self, blocks, max_value=None):
+        # same as detect_clouds but for a scene streamed as RasterBlocks
+        # (a RasterReader, or RasterReader.iter_blocks / ImageProcessor.load_image_blocks)
+        # only counts are kept, so memory is one block no matter the scene size
+        # max_value: full scale of the data (e.g. 10000 for Sentinel-2 L2A, 1.0 for
+        # 0-1 reflectance); without it uint16 / int blocks are rejected, and float
+        # data is scaled from a decimated read of the whole scene when a RasterReader
+        # is passed, rejected when only blocks are (one block cannot tell the range)
+        # returns None on error or when there was nothing to read (e.g. missing file)
+        print("check point detecting clouds block by block...")
+        try:
+            total_pixels = 0
+            cloud_pixels = 0
+            scale = None
+            if hasattr(blocks, 'iter_blocks'):
+                scale = self.raster_scale(blocks, max_value)
+                blocks = blocks.iter_blocks()
+            for block in blocks:
+                img = block.data
+                if img.ndim != 3 or img.shape[2] < 3:
+                    print("check point block is not in expected format")
+                    return None
+                if scale is None:
+                    if img.dtype.kind == 'f' and max_value is None:
+                        raise ValueError("float blocks need max_value, or pass the RasterReader "
+                                         "so the range comes from the whole scene")
+                    scale = self.scene_scale(img, max_value)
+                img = self.to_byte_range(img, scale)
+                total_pixels += img.shape[0] * img.shape[1]
+                cloud_pixels += int(np.count_nonzero(self._cloud_mask(img)))
+
+            if total_pixels == 0:
+                print("check point no blocks to process")
+                return None
+
+            cloud_percentage = (cloud_pixels / total_pixels) * 100.0
+            print(f"cloud percentage: {cloud_percentage}%")
+            print(f"total pixels: {total_pixels}, cloud pixels: {cloud_pixels} ")
+            return cloud_percentage
+
+        except Exception as e:
+            print(f"Error in block cloud detection: {e}")
+            return None
+
+    def screen_clouds(self, image, sample_size=2000, max_samples=50000, confidence=0.99, seed=None):
+        """
+        Fast usable / too-cloudy decision from a pixel sample
+
+        Pixels are sampled in rounds of sample_size; after each round a confidence
+        interval for the cloud percentage is checked against cloud_threshold_percent.
+        Sampling stops as soon as the interval is clearly on one side. Only
+        borderline scenes (still straddling the threshold after max_samples)
+        fall back to the full detect_clouds mask.
+
+        Args:
+            image: (H, W, 3) image, 0-255 or 0-1
+            sample_size (int): Pixels per round
+            max_samples (int): Pixels to sample before falling back to the full mask
+            confidence (float): Confidence level of the interval
+            seed (int): Random seed for reproducible screening
+
+        Returns:
+            dict: cloud_percentage, low, high, usable, method ("sampled" or "full"), samples
+        """
+        print("check point screening clouds from a sample...")
+        try:
+            if len(image.shape) != 3:
+                print("check point image is not in expected format")
+                return None
+
+            height, width = image.shape[:2]
+            pixels = image.reshape(height * width, image.shape[2])
+            rng = np.random.default_rng(seed)
+            # 0-1 images are recognised from the first sample instead of a full max() scan
+            scale = None
+            sampled = 0
+            cloudy = 0
+            threshold = self.cloud_threshold_percent / 100.0
+
+            while sampled < max_samples:
+                sample = pixels[rng.integers(0, height * width, size=sample_size)]
+                if scale is None:
+                    scale = sample.dtype.kind == 'f' and sample.max() <= 1.0
+                if scale:
+                    sample = (sample * 255).astype(np.uint8)
+                bright = sample[:, :3] > self.brightness_threshold
+                cloudy += int(np.count_nonzero(bright.all(axis=1)))
+                sampled += sample_size
+
+                low, high = wilson_interval(cloudy, sampled, confidence)
+                if high < threshold or low >= threshold:
+                    result = {
+                        "cloud_percentage": cloudy / sampled * 100.0,
+                        "low": low * 100.0,
+                        "high": high * 100.0,
+                        "usable": bool(high < threshold),
+                        "method": "sampled",
+                        "samples": sampled
+                    }
+                    print(f"cloud percentage ~{result['cloud_percentage']:.2f}% "
+                          f"({result['low']:.2f}-{result['high']:.2f}%) from {sampled} pixels")
+                    print(f"Status : {'Usable' if result['usable'] else 'Too cloudy'} (screened)")
+                    return result
+
+            print("check point borderline scene, computing full cloud mask")
+            _, cloud_percentage = self.detect_clouds(image)
+            return {
+                "cloud_percentage": cloud_percentage,
+                "low": cloud_percentage,
+                "high": cloud_percentage,
+                "usable": bool(cloud_percentage < self.cloud_threshold_percent),
+                "method": "full",
+                "samples": sampled
+            }
+
+        except Exception as e:
+            print(f"Error in cloud screening: {e}")
+            return None
+
+    def detect_clouds_batch(self, images, return_masks=False, num_workers=4, chunk_size=16):
+        """
+        Cloud percentage for many scenes at once, e.g. to rank a catalogue
+
+        A (N, H, W, C) stack is processed in chunks of scenes, each chunk fully
+        vectorized; an iterable of scenes (any sizes, e.g. a generator loading
+        files) is processed scene by scene. Either way the work is spread over a
+        thread pool with a bounded number of scenes in flight.
+
+        Args:
+            images: (N, H, W, C) array or iterable of (H, W, C) arrays, 0-255 or 0-1
+            return_masks (bool): Also return cloud masks, bit-packed along width
+                                 (np.unpackbits(mask, axis=-1)[..., :W] restores them)
+            num_workers (int): Threads
+            chunk_size (int): Scenes per task for stacked input
+
+        Returns:
+            dict: cloud_percentages (N,), usable (N,) bool, ranking (scene indices,
+                  clearest first) and masks (list of packed masks) if requested
+        """
+        print("check point detecting clouds for a batch of scenes...")
+        try:
+            if isinstance(images, np.ndarray):
+                if images.ndim != 4:
+                    print("check point batch is not in expected (N, H, W, C) format")
+                    return None
+                chunks = (images[start:start + chunk_size] for start in range(0, len(images), chunk_size))
+            else:
+                # single scenes of any size, one per task
+                chunks = (np.asarray(image)[None] for image in images)
+
+            percentages = []
+            masks = [] if return_masks else None
+
+            def process(chunk):
+                chunk = self._batch_to_uint8(chunk)
+                bright = chunk[..., :3] > self.brightness_threshold
+                cloud_mask = bright.all(axis=-1)
+                chunk_percentages = cloud_mask.mean(axis=(1, 2)) * 100.0
+                packed = list(np.packbits(cloud_mask, axis=-1)) if return_masks else None
+                return chunk_percentages, packed
+
+            with ThreadPoolExecutor(max_workers=max(1, num_workers)) as pool:
+                pending = deque()
+
+                def collect_oldest():
+                    chunk_percentages, packed = pending.popleft().result()
+                    percentages.extend(chunk_percentages.tolist())
+                    if return_masks:
+                        masks.extend(packed)
+
+                for chunk in chunks:
+                    if chunk.ndim != 4:
+                        raise ValueError(f"Scene with shape {chunk.shape[1:]} is not (H, W, C)")
+                    pending.append(pool.submit(process, chunk))
+                    if len(pending) >= max(1, num_workers) * 2:
+                        collect_oldest()
+                while pending:
+                    collect_oldest()
+
+            cloud_percentages = np.array(percentages)
+            usable = cloud_percentages < self.cloud_threshold_percent
+            result = {
+                "cloud_percentages": cloud_percentages,
+                "usable": usable,
+                "ranking": np.argsort(cloud_percentages, kind='stable')
+            }
+            if return_masks:
+                result["masks"] = masks
+
+            print(f"scenes: {len(cloud_percentages)}, usable: {int(usable.sum())}")
+            return result
+
+        except Exception as e:
+            print(f"Error in batch cloud detection: {e}")
+            return None
+
+    def _batch_to_uint8(self, chunk):
+        # per scene, same rule as detect_clouds: a float scene with max <= 1 is 0-1
+        if chunk.dtype == np.uint8:
+            return chunk
+        scene_max = chunk.reshape(len(chunk), -1).max(axis=1)
+        scaled = np.empty(chunk.shape, dtype=chunk.dtype)
+        for i, is_unit in enumerate(scene_max <= 1.0):
+            if is_unit:
+                scaled[i] = (chunk[i] * 255).astype(np.uint8)
+            else:
+                scaled[i] = chunk[i]
+        return scaled
+
     def visualize_clouds(self,image,cloud_mask,output_path):
         try :
             print("check point visualizing clouds....")
@@ -89,6 +382,10 @@ class CloudDetector:
             print(f"Error in visualizing clouds: {e}")  
             
     def is_image_usable(self, cloud_percentage):
+        if cloud_percentage is None:
+            # detection failed or read nothing, never pass a scene as clear
+            print(" Image is NOT USABLE (no cloud measurement)")
+            return False
         try:
             if hasattr(cloud_percentage, 'item'):
                 cloud_pct = cloud_percentage.item()
@@ -0,0 +1,196 @@
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.cloud_detector import CloudDetector
+
+
+class CompositeBuilder:
+    """
+    Builds a cloud-free composite from a time stack of acquisitions
+    Instead of throwing away scenes is_image_usable rejects, every clear pixel
+    of every date contributes to the final image
+
+    Value scaling and the cloudiness ranking of the dates are decided once per
+    scene, so a streamed composite does not depend on the chunk size.
+    """
+
+    def __init__(self, cloud_detector=None, method="median", block_size=512, num_workers=4):
+        """
+        Initialize composite builder
+
+        Args:
+            cloud_detector (CloudDetector): Supplies brightness_threshold (default CloudDetector())
+            method (str): "median" - per-pixel median of the clear dates
+                          "best" - per pixel, the clear date from the least cloudy scene
+            block_size (int): Chunk size when streaming rasters
+            num_workers (int): Threads processing chunks
+        """
+        if method not in ("median", "best"):
+            raise ValueError(f"Unknown composite method: {method}")
+        self.cloud_detector = cloud_detector or CloudDetector()
+        self.method = method
+        self.block_size = block_size
+        self.num_workers = num_workers
+
+        print(f"CompositeBuilder initialized")
+        print(f"   Method: {method}, block size: {block_size}, workers: {num_workers}")
+
+    def composite_array(self, stack, scales=None, date_order=None, max_value=None):
+        """
+        Composite an in-memory (T, H, W, C) stack (also used per chunk by build)
+
+        Pixels that are cloudy on every date fall back to the darkest date
+        (clouds are the brightest thing in the stack).
+
+        Args:
+            stack (numpy.ndarray): (T, H, W, C) acquisitions, channel order as CloudDetector expects
+            scales (list): Per-date CloudDetector.scene_scale factors
+                           (default: decided from this stack, i.e. it is the whole scene)
+            date_order (list): Dates from least to most cloudy, used by "best"
+                               (default: ranked on this stack)
+            max_value: Full scale of >8 bit integer data, see CloudDetector.scene_scale
+
+        Returns:
+            tuple: (composite, clear_count)
+                - composite: (H, W, C) in the stack's dtype
+                - clear_count: (H, W) number of clear dates per pixel
+        """
+        detector = self.cloud_detector
+        if scales is None:
+            scales = [detector.scene_scale(date, max_value) for date in stack]
+        cloudy = np.stack([detector.cloud_mask(date, scale) for date, scale in zip(stack, scales)])
+        clear = ~cloudy
+        clear_count = clear.sum(axis=0)
+
+        # darkest date per pixel, used where no date is clear
+        brightness = np.stack([
+            detector.to_byte_range(date, scale)[..., :3].sum(axis=-1, dtype=np.float32)
+            for date, scale in zip(stack, scales)
+        ])
+        darkest = np.argmin(brightness, axis=0)
+        fallback = np.take_along_axis(stack, darkest[None, :, :, None], axis=0)[0]
+
+        if self.method == "median":
+            values = stack.astype(np.float32)
+            values[cloudy] = np.nan
+            with warnings.catch_warnings():
+                # all-cloudy pixels give an all-NaN slice, filled from fallback below
+                warnings.simplefilter("ignore", RuntimeWarning)
+                median = np.nanmedian(values, axis=0)
+            if stack.dtype.kind in 'iu':
+                median = np.round(median)
+            composite = np.where(np.isnan(median), fallback, median).astype(stack.dtype)
+        else:
+            # prefer dates that are clearer overall, then take the first clear one per pixel
+            if date_order is None:
+                date_order = np.argsort(cloudy.reshape(len(stack), -1).mean(axis=1), kind='stable')
+            order = np.asarray(date_order)
+            first_clear = order[np.argmax(clear[order], axis=0)]
+            best = np.take_along_axis(stack, first_clear[None, :, :, None], axis=0)[0]
+            composite = np.where((clear_count > 0)[..., None], best, fallback)
+
+        return composite, clear_count
+
+    def build(self, image_paths, output_path, bands=None, max_value=None):
+        """
+        Stream a composite over co-registered GeoTIFFs, chunk by chunk
+
+        Only one chunk of every date is in memory at a time, so full scenes with
+        dozens of dates work; chunks are composited on a thread pool. Before that,
+        float scenes get one decimated read to find their range and "best" gets
+        one pass to rank the dates by cloud cover, so the result matches
+        composite_array on the whole stack.
+
+        Args:
+            image_paths (list): One GeoTIFF per date, same size and grid
+            output_path (str): Composite GeoTIFF to write
+            bands (tuple): 1-based bands to read, e.g. (3, 2, 1) for RGB -> BGR
+            max_value: Full scale of >8 bit integer data, see CloudDetector.scene_scale
+
+        Returns:
+            dict: total_pixels, no_clear_pixels, no_clear_percentage, mean_clear_dates
+                  (None on error)
+        """
+        import rasterio
+        from utils.raster_reader import RasterReader
+
+        print(f"\nBuilding {self.method} composite from {len(image_paths)} dates...")
+
+        readers = []
+        try:
+            for path in image_paths:
+                readers.append(RasterReader(path, block_size=self.block_size, bands=bands))
+            first = readers[0]
+            for reader in readers[1:]:
+                if (reader.width, reader.height) != (first.width, first.height):
+                    raise ValueError(f"{reader.image_path} is {reader.width}x{reader.height}, "
+                                     f"expected {first.width}x{first.height}")
+
+            profile = first.profile.copy()
+            profile.update(driver='GTiff', count=len(first.bands), compress='deflate')
+            if first.width >= 256 and first.height >= 256:
+                profile.update(tiled=True, blockxsize=256, blockysize=256)
+            else:
+                profile.update(tiled=False)
+                profile.pop('blockxsize', None)
+                profile.pop('blockysize', None)
+
+            scales = [self.cloud_detector.raster_scale(reader, max_value) for reader in readers]
+            date_order = self._date_order(readers, scales) if self.method == "best" else None
+
+            total_pixels = first.width * first.height
+            no_clear_pixels = 0
+            clear_dates_sum = 0
+
+            with rasterio.open(output_path, 'w', **profile) as dst, \
+                    ThreadPoolExecutor(max_workers=max(1, self.num_workers)) as pool:
+                pending = deque()
+
+                def write_oldest():
+                    nonlocal no_clear_pixels, clear_dates_sum
+                    window, future = pending.popleft()
+                    composite, clear_count = future.result()
+                    dst.write(np.moveaxis(composite, -1, 0), window=window)
+                    no_clear_pixels += int(np.count_nonzero(clear_count == 0))
+                    clear_dates_sum += int(clear_count.sum())
+
+                for _, _, window in first.windows():
+                    # rasterio handles are not thread safe, read here and compute in the pool
+                    stack = np.stack([reader.read_window(window) for reader in readers])
+                    pending.append((window, pool.submit(self.composite_array, stack, scales, date_order)))
+                    if len(pending) >= max(1, self.num_workers) * 2:
+                        write_oldest()
+                while pending:
+                    write_oldest()
+
+            summary = {
+                "total_pixels": total_pixels,
+                "no_clear_pixels": no_clear_pixels,
+                "no_clear_percentage": no_clear_pixels / total_pixels * 100.0,
+                "mean_clear_dates": clear_dates_sum / total_pixels
+            }
+            print(f"   Pixels with no clear date: {summary['no_clear_percentage']:.2f}%")
+            print(f"   Mean clear dates per pixel: {summary['mean_clear_dates']:.1f}")
+            print(f"   Composite saved to: {output_path}")
+            return summary
+
+        except Exception as e:
+            print(f"Error building composite: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+        finally:
+            for reader in readers:
+                reader.close()
+
+    def _date_order(self, readers, scales):
+        """Dates from least to most cloudy over the whole scene (one counting pass)"""
+        cloudy = np.zeros(len(readers), dtype=np.int64)
+        for _, _, window in readers[0].windows():
+            for t, (reader, scale) in enumerate(zip(readers, scales)):
+                cloudy[t] += np.count_nonzero(self.cloud_detector.cloud_mask(reader.read_window(window), scale))
+        print(f"   Cloudy pixels per date: {cloudy.tolist()}")
+        return np.argsort(cloudy, kind='stable')
@@ -4,20 +4,50 @@ import numpy as np
 from PIL import Image
 import os
 import cv2   
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 #class to handle image processing 
 #basically photo editor before sending to AI model
 class ImageProcessor:
-    def __init__(self,target_size=256):
+    def __init__(self,target_size=256,cache=None,fast_decode=False,overviews=None):
         self.target_size = target_size
+        #fast_decode: let the JPEG decoder downscale (DCT scaling) when the
+        #source is much bigger than target_size, resize_image finishes the job
+        self.fast_decode = fast_decode
+        #optional OverviewPyramid, read the smallest prebuilt level >= target_size
+        self.overviews = overviews
+        #optional PreprocessCache, skips decode+resize for files seen before
+        self.cache = cache
+        #paths that could not be preprocessed in the last batch
+        self.failed_paths = []
+        #reused uint8 buffer for the fused resize (see preprocess_into)
+        self._resize_buffer = None
         print("ImageProcessor initialized with target size:", self.target_size)
 
-    def load_image(self,image_path):
+    def load_image(self,image_path,min_size=None):
+            '''
+            min_size: if given, only this resolution is needed: the smallest
+                      overview level >= min_size is used when overviews are set,
+                      otherwise with fast_decode JPEGs are decoded at the smallest
+                      1/2, 1/4 or 1/8 scale that keeps both sides >= min_size
+                      (PIL draft mode, lossy); without it the full image is decoded
+            '''
             try:
                 if not os.path.exists(image_path):
                     print("File does not exist:", image_path)
                     return None
+                if min_size is not None and self.overviews is not None:
+                    level=self.overviews.load(image_path,min_size)
+                    if level is not None:
+                        return level
                 img = Image.open(image_path)
+                if min_size is not None and self.fast_decode:
+                    #no-op for formats without reduced decoding (PNG, TIFF)
+                    img.draft('RGB',(min_size,min_size))
                 #converting to same format 
                 img=img.convert('RGB')
                 #image to numbers  conversion using numpy
@@ -28,6 +58,21 @@ class ImageProcessor:
                 print("Error loading image:", e)
                 return None
     
+    def load_image_blocks(self,image_path,block_size=1024,bands=None):
+            #for scenes too big for RAM (full Sentinel-2 tiles)
+            #yields RasterBlock pieces instead of one giant array
+            from utils.raster_reader import RasterReader
+            try:
+                if not os.path.exists(image_path):
+                    print("File does not exist:", image_path)
+                    return
+                with RasterReader(image_path,block_size=block_size,bands=bands) as reader:
+                    for block in reader.iter_blocks():
+                        yield block
+            except Exception as e:
+                print("Error reading image blocks:", e)
+                return
+
     def resize_image(self,img_array):
         
             try:
@@ -69,7 +114,14 @@ class ImageProcessor:
             1. load 2. resize 3. normalize
             '''
             print('starting preprocessing for image:', image_path)
-            img=self.load_image(image_path)
+            cache_key=self._cache_key(image_path)
+            if cache_key is not None:
+                cached=self.cache.get(cache_key)
+                if cached is not None:
+                    print('loaded from cache')
+                    return cached
+
+            img=self.load_image(image_path,self._decode_size())
 
             if img is None:
                 return None
@@ -82,30 +134,252 @@ class ImageProcessor:
             print(f"final shape:{img_resized.shape}")
             img_normalized=self.normalize_image(img_resized)
             print(f"value ranges from :[{img_normalized.min():.3f}]")
+            if cache_key is not None and img_normalized is not None:
+                self.cache.put(cache_key,img_normalized)
             return img_normalized
+
+    def _decode_size(self):
+            #size load_image may reduce to: overview levels, or draft decoding (fast_decode only)
+            reduced=self.fast_decode or self.overviews is not None
+            return self.target_size if reduced else None
+
+    def _cache_key(self,image_path):
+            #None when caching is off or the file can't be read
+            if self.cache is None or not os.path.exists(image_path):
+                return None
+            try:
+                #reduced decodes give slightly different pixels, keep them apart:
+                #an overview level (per factor) and a draft decode are different variants
+                decode_size=self._decode_size()
+                variant=''
+                if decode_size is not None:
+                    factor=None
+                    if self.overviews is not None:
+                        factor=self.overviews.level_factor(image_path,decode_size)
+                    if factor:
+                        variant=f'overview{factor}'
+                    elif self.fast_decode:
+                        variant='draft'
+                return self.cache.make_key(image_path,self.target_size,np.float32,variant)
+            except OSError as e:
+                print("Error hashing image for cache:", e)
+                return None
     
+    #fused resize+normalize, writes the result straight into out
+    #same values as resize_image+normalize_image without the intermediate copies
+    def resize_normalize_into(self,img_array,out):
+            '''
+            img_array: uint8 (H, W, 3) image as returned by load_image
+            out: preallocated float32 array of shape (target_size, target_size, 3),
+                 e.g. one slot of a batch buffer: batch[i]
+            '''
+            current_height, current_width = img_array.shape[:2]
+            if current_width>self.target_size or current_height>self.target_size:
+                 interpolation = cv2.INTER_AREA
+            else:
+                 interpolation = cv2.INTER_CUBIC
+
+            #resize into a pooled uint8 buffer instead of a new array
+            if self._resize_buffer is None or self._resize_buffer.shape!=(self.target_size,self.target_size,3):
+                 self._resize_buffer=np.empty((self.target_size,self.target_size,3),dtype=np.uint8)
+            cv2.resize(
+                 img_array,
+                 (self.target_size, self.target_size),
+                 dst=self._resize_buffer,
+                 interpolation=interpolation
+            )
+            #uint8 -> float32 and /255 in one step, written into out
+            np.divide(self._resize_buffer,np.float32(255.0),out=out)
+            return out
+
+    def preprocess_into(self,image_path,out):
+            #load + fused resize/normalize into out
+            #returns True on success, False if the image could not be processed
+            try:
+                cache_key=self._cache_key(image_path)
+                if cache_key is not None:
+                    cached=self.cache.get(cache_key)
+                    if cached is not None:
+                        out[...]=cached
+                        return True
+
+                img=self.load_image(image_path,self._decode_size())
+                if img is None:
+                    return False
+                self.resize_normalize_into(img,out)
+                if cache_key is not None:
+                    self.cache.put(cache_key,out)
+                return True
+            except Exception as e:
+                print("Error preprocessing image:", e)
+                return False
+
+    def _write_preprocessed(self,image_paths,next_slot,num_workers=1,chunk_size=8):
+            #preprocesses image_paths in order, each successful image is written into next_slot()
+            #yields (path, ok) so the caller can move its slot forward
+            #num_workers>1 spreads decode/resize/normalize over a process pool
+            #workers are spawned, not forked: this runs on the producer thread while
+            #TensorFlow / other threads are live, and a forked child can inherit their held locks
+            #(so like any spawn pool, scripts using workers need an if __name__=="__main__" guard)
+            if num_workers is None or num_workers<=1:
+                for path in image_paths:
+                    yield path,self.preprocess_into(path,next_slot())
+                return
+            pool=ProcessPoolExecutor(
+                 max_workers=num_workers,
+                 mp_context=multiprocessing.get_context("spawn"),
+                 initializer=_init_worker,
+                 initargs=(self.target_size,self.cache,self.fast_decode,self.overviews)
+            )
+            chunk_size=max(1,chunk_size)
+            #only num_workers*2 chunks submitted at a time, so finished images never
+            #pile up ahead of the consumer; futures are collected in input order
+            pending=deque()
+            try:
+                for start in range(0,len(image_paths),chunk_size):
+                    chunk=image_paths[start:start+chunk_size]
+                    pending.append((chunk,pool.submit(_preprocess_chunk_worker,chunk)))
+                    if len(pending)<num_workers*2:
+                        continue
+                    yield from self._write_chunk(*pending.popleft(),next_slot)
+                while pending:
+                    yield from self._write_chunk(*pending.popleft(),next_slot)
+            finally:
+                #consumer stopped early: drop queued chunks, only wait for running ones
+                pool.shutdown(wait=True,cancel_futures=True)
+
+    def _write_chunk(self,chunk,future,next_slot):
+            for path,img in zip(chunk,future.result()):
+                if img is None:
+                    yield path,False
+                    continue
+                next_slot()[...]=img
+                yield path,True
+
     #for processing multiple images at once
-    def preprocess_batch(self,image_paths):
-            print(f'batch preprocessing for {len(image_paths)}')
-            preprocessed_images=[]
+    def preprocess_batch(self,image_paths,num_workers=1,chunk_size=8):
+            '''
+            num_workers: processes to use (1 = one after another like before)
+            chunk_size: paths handed to a worker at a time
+            failed paths are kept in self.failed_paths
+            '''
+            image_paths=list(image_paths)
+            print(f'batch preprocessing for {len(image_paths)} (workers: {num_workers})')
+            self.failed_paths=[]
+            #one buffer for the whole batch, images are written into it in place
+            batch=np.empty((len(image_paths),self.target_size,self.target_size,3),dtype=np.float32)
+            count=0
 
-            for i,path in enumerate(image_paths,1):
+            items=self._write_preprocessed(image_paths,lambda: batch[count],num_workers,chunk_size)
+            for i,(path,ok) in enumerate(items,1):
                  print(f"\n...Image{i}/{len(image_paths)}...")
-                 img=self.preprocess_image(path)
 
-                 if img is not None :
-                     preprocessed_images.append(img)
+                 if ok :
+                     count+=1
                  else:
-                     print("error")
-            if len(preprocessed_images)==0:
+                     self.failed_paths.append(path)
+                     print(f"error: could not preprocess {path}")
+            if count==0:
                 print("no image found")
                 return None
-            batch =np.array(preprocessed_images)
+            #drop the slots of failed images (a view, no copy)
+            batch =batch[:count]
             print(f"batch prep completed")
             print(f"batch shape : {batch.shape}")
-            print(f"successful preprocessed images : {len(preprocessed_images)}/{len(image_paths)}")
+            print(f"successful preprocessed images : {count}/{len(image_paths)}")
+            if self.failed_paths:
+                print(f"failed images : {self.failed_paths}")
             return batch
 
+    #streaming version of preprocess_batch
+    #yields fixed size batches while later images are still being decoded
+    def iter_batches(self,image_paths,batch_size=32,prefetch=2,num_workers=1,chunk_size=8):
+            '''
+            yields (batch, batch_paths)
+            batch: (batch_size, H, W, 3) float32, the last one can be smaller
+            prefetch: batches decoded ahead in a background thread
+            failed paths are skipped and kept in self.failed_paths
+            '''
+            image_paths=list(image_paths)
+            self.failed_paths=[]
+            batches=queue.Queue(maxsize=max(1,prefetch))
+            stop=threading.Event()
+            done=object()
+
+            def put(item):
+                #give up if the consumer stopped reading
+                while not stop.is_set():
+                    try:
+                        batches.put(item,timeout=0.1)
+                        return True
+                    except queue.Full:
+                        continue
+                return False
+
+            def producer():
+                try:
+                    shape=(batch_size,self.target_size,self.target_size,3)
+                    #each batch gets its own buffer, images are written straight into it
+                    batch=np.empty(shape,dtype=np.float32)
+                    batch_paths=[]
+                    items=self._write_preprocessed(
+                         image_paths,lambda: batch[len(batch_paths)],num_workers,chunk_size)
+                    try:
+                        for path,ok in items:
+                            if stop.is_set():
+                                return
+                            if not ok:
+                                self.failed_paths.append(path)
+                                print(f"error: could not preprocess {path}")
+                                continue
+                            batch_paths.append(path)
+                            if len(batch_paths)==batch_size:
+                                if not put((batch,batch_paths)):
+                                    return
+                                batch=np.empty(shape,dtype=np.float32)
+                                batch_paths=[]
+                    finally:
+                        #stops the worker pool right away when the consumer quit
+                        items.close()
+                    if batch_paths:
+                        if not put((batch[:len(batch_paths)],batch_paths)):
+                            return
+                    put(done)
+                except Exception as e:
+                    put(e)
+
+            worker=threading.Thread(target=producer,daemon=True)
+            worker.start()
+            try:
+                while True:
+                    item=batches.get()
+                    if item is done:
+                        break
+                    if isinstance(item,Exception):
+                        raise item
+                    yield item
+            finally:
+                stop.set()
+                worker.join()
+
+    def as_tf_dataset(self,image_paths,batch_size=32,prefetch=2,num_workers=1,chunk_size=8):
+            #tf.data front end for the U-Net detailed path
+            #model.predict(dataset) can start on the first batch right away
+            import tensorflow as tf
+
+            image_paths=list(image_paths)
+
+            def generator():
+                for batch,_ in self.iter_batches(image_paths,batch_size,prefetch,num_workers,chunk_size):
+                    yield batch
+
+            dataset=tf.data.Dataset.from_generator(
+                 generator,
+                 output_signature=tf.TensorSpec(
+                      shape=(None,self.target_size,self.target_size,3),dtype=tf.float32)
+            )
+            return dataset.prefetch(tf.data.AUTOTUNE)
+
     def save_preprocessed_comparison(self, original_path, preprocessed_array, output_path):
         """
         Save before/after comparison image
@@ -140,4 +414,23 @@ class ImageProcessor:
             print(f" Comparison saved to: {output_path}")
             
         except Exception as e:
-            print(f"  Could not save comparison: {str(e)}")
\ No newline at end of file
+            print(f"  Could not save comparison: {str(e)}")
+
+
+#process pool helpers (must be module level so they can be pickled)
+_worker_processor=None
+
+def _init_worker(target_size,cache=None,fast_decode=False,overviews=None):
+    global _worker_processor
+    _worker_processor=ImageProcessor(target_size=target_size,cache=cache,
+                                     fast_decode=fast_decode,overviews=overviews)
+
+def _preprocess_worker(image_path):
+    try:
+        return _worker_processor.preprocess_image(image_path)
+    except Exception as e:
+        print("Error preprocessing image:", e)
+        return None
+
+def _preprocess_chunk_worker(image_paths):
+    return [_preprocess_worker(path) for path in image_paths]
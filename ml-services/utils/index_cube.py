@@ -0,0 +1,225 @@
+import os
+import json
+import zlib
+import shutil
+import numpy as np
+
+
+class IndexCube:
+    """
+    Time-series storage for index rasters (NDVI, NDWI, ...) per area of interest
+    Feeds the temporal / LSTM stage with history that grows one acquisition at a time
+
+    Layout on disk, one cube per AOI and index:
+        root/<aoi>/<index>/meta.json           size, dtype, chunking, list of dates
+        root/<aoi>/<index>/head.npy            memory-mapped (time_chunk, H, W) for the newest dates
+        root/<aoi>/<index>/chunk_00000/r_c.z   sealed, zlib-compressed (time_chunk, tile, tile) pieces
+
+    Appending writes into the head only. When the head is full it is cut into
+    spatial tiles, compressed, and never touched again, so history is not rewritten.
+    meta.json is the commit point: a chunk counts once meta lists it, and the head
+    is only cleared after that, so an interrupted append loses nothing committed
+    and can simply be retried.
+    A pixel's time series reads one small tile per sealed chunk; a date's raster
+    reads the tiles of one chunk.
+    """
+
+    def __init__(self, root_dir, tile_size=256, time_chunk=32, dtype=np.float32):
+        """
+        Initialize cube store
+
+        Args:
+            root_dir (str): Folder holding all AOIs
+            tile_size (int): Spatial size of compressed tiles
+            time_chunk (int): Dates per sealed chunk
+            dtype: Stored value type (float16 halves the size for NDVI/NDWI)
+        """
+        self.root_dir = root_dir
+        self.tile_size = tile_size
+        self.time_chunk = time_chunk
+        self.dtype = np.dtype(dtype)
+        os.makedirs(root_dir, exist_ok=True)
+
+        print(f"IndexCube initialized at {root_dir}")
+        print(f"   Tile size: {tile_size}, dates per chunk: {time_chunk}")
+
+    def _cube_dir(self, aoi, index):
+        return os.path.join(self.root_dir, aoi, index)
+
+    def _load_meta(self, aoi, index):
+        path = os.path.join(self._cube_dir(aoi, index), 'meta.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_meta(self, aoi, index, meta):
+        path = os.path.join(self._cube_dir(aoi, index), 'meta.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _head(self, aoi, index, meta, mode='r+'):
+        path = os.path.join(self._cube_dir(aoi, index), 'head.npy')
+        if mode == 'w+':
+            head = np.lib.format.open_memmap(
+                path, mode='w+', dtype=meta['dtype'],
+                shape=(meta['time_chunk'], meta['height'], meta['width'])
+            )
+            head[:] = np.nan if np.dtype(meta['dtype']).kind == 'f' else 0
+            return head
+        return np.load(path, mmap_mode=mode)
+
+    def _tiles(self, meta):
+        tile = meta['tile_size']
+        for r in range(0, meta['height'], tile):
+            for c in range(0, meta['width'], tile):
+                yield r // tile, c // tile, slice(r, r + tile), slice(c, c + tile)
+
+    def _tile_path(self, aoi, index, chunk, r, c):
+        return os.path.join(self._cube_dir(aoi, index), f"chunk_{chunk:05d}", f"{r}_{c}.z")
+
+    def _read_tile(self, aoi, index, meta, chunk, r, c):
+        tile = meta['tile_size']
+        height = min(tile, meta['height'] - r * tile)
+        width = min(tile, meta['width'] - c * tile)
+        with open(self._tile_path(aoi, index, chunk, r, c), 'rb') as f:
+            data = zlib.decompress(f.read())
+        return np.frombuffer(data, dtype=meta['dtype']).reshape(meta['time_chunk'], height, width)
+
+    def _seal_head(self, aoi, index, meta):
+        # compress the full head into per-tile files; the caller commits meta, then clears the head
+        chunk = meta['sealed_chunks']
+        head = self._head(aoi, index, meta, mode='r')
+        chunk_dir = os.path.join(self._cube_dir(aoi, index), f"chunk_{chunk:05d}")
+        tmp_dir = chunk_dir + '.tmp'
+        # leftovers of an interrupted seal: meta does not list this chunk yet, so rewrite it
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for r, c, rows, cols in self._tiles(meta):
+            piece = np.ascontiguousarray(head[:, rows, cols])
+            with open(os.path.join(tmp_dir, f"{r}_{c}.z"), 'wb') as f:
+                f.write(zlib.compress(piece.tobytes(), 6))
+        del head
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        os.replace(tmp_dir, chunk_dir)
+        meta['sealed_chunks'] = chunk + 1
+        print(f"   Sealed chunk {chunk} ({meta['time_chunk']} dates)")
+
+    def append(self, aoi, date, raster, index="ndvi"):
+        """
+        Add one acquisition to an AOI's history
+
+        Args:
+            aoi (str): Area of interest id (used as folder name)
+            date (str): Acquisition date, ISO format, must be later than the last one
+            raster (numpy.ndarray): (H, W) index raster, same size for every date
+            index (str): Index name (one cube per index)
+
+        Returns:
+            int: Position of the new date in the time axis
+        """
+        cube_dir = self._cube_dir(aoi, index)
+        meta = self._load_meta(aoi, index)
+        if meta is None:
+            os.makedirs(cube_dir, exist_ok=True)
+            meta = {
+                "height": int(raster.shape[0]),
+                "width": int(raster.shape[1]),
+                "dtype": self.dtype.str,
+                "tile_size": self.tile_size,
+                "time_chunk": self.time_chunk,
+                "sealed_chunks": 0,
+                "dates": []
+            }
+            self._head(aoi, index, meta, mode='w+')
+            print(f"Created cube {aoi}/{index} ({meta['height']}x{meta['width']})")
+
+        if raster.shape != (meta['height'], meta['width']):
+            raise ValueError(f"Raster shape {raster.shape} does not match cube "
+                             f"({meta['height']}, {meta['width']})")
+        if meta['dates'] and date <= meta['dates'][-1]:
+            raise ValueError(f"Date {date} is not after last date {meta['dates'][-1]}")
+
+        position = len(meta['dates'])
+        head = self._head(aoi, index, meta)
+        head[position % meta['time_chunk']] = raster
+        head.flush()
+        del head
+        meta['dates'].append(date)
+
+        sealing = len(meta['dates']) % meta['time_chunk'] == 0
+        if sealing:
+            self._seal_head(aoi, index, meta)
+
+        self._save_meta(aoi, index, meta)
+        if sealing:
+            # only now that meta points at the sealed chunk can the head be reused
+            self._head(aoi, index, meta, mode='w+')
+        print(f"Appended {date} to {aoi}/{index} (t={position})")
+        return position
+
+    def dates(self, aoi, index="ndvi"):
+        meta = self._load_meta(aoi, index)
+        return list(meta['dates']) if meta else []
+
+    def _position(self, meta, date):
+        if isinstance(date, (int, np.integer)):
+            position = int(date)
+            if position < 0:
+                position += len(meta['dates'])
+        else:
+            position = meta['dates'].index(date)
+        if not 0 <= position < len(meta['dates']):
+            raise IndexError(f"Date position {date} out of range")
+        return position
+
+    def read_date(self, aoi, date, index="ndvi"):
+        """
+        Raster of one acquisition
+
+        Args:
+            date: ISO date string or position (negative counts from the end)
+
+        Returns:
+            numpy.ndarray: (H, W) raster
+        """
+        meta = self._load_meta(aoi, index)
+        if meta is None:
+            raise KeyError(f"No cube for {aoi}/{index}")
+        position = self._position(meta, date)
+        chunk, offset = divmod(position, meta['time_chunk'])
+
+        if chunk == meta['sealed_chunks']:
+            return np.array(self._head(aoi, index, meta, mode='r')[offset])
+
+        raster = np.empty((meta['height'], meta['width']), dtype=meta['dtype'])
+        for r, c, rows, cols in self._tiles(meta):
+            raster[rows, cols] = self._read_tile(aoi, index, meta, chunk, r, c)[offset]
+        return raster
+
+    def pixel_series(self, aoi, row, col, index="ndvi"):
+        """
+        Full history of one pixel
+
+        Returns:
+            tuple: (dates, values) - list of ISO dates and (T,) array
+        """
+        meta = self._load_meta(aoi, index)
+        if meta is None:
+            raise KeyError(f"No cube for {aoi}/{index}")
+        tile = meta['tile_size']
+        r, c = row // tile, col // tile
+        values = []
+        for chunk in range(meta['sealed_chunks']):
+            values.append(self._read_tile(aoi, index, meta, chunk, r, c)[:, row % tile, col % tile])
+        in_head = len(meta['dates']) - meta['sealed_chunks'] * meta['time_chunk']
+        if in_head:
+            head = self._head(aoi, index, meta, mode='r')
+            values.append(np.array(head[:in_head, row, col]))
+        series = np.concatenate(values) if values else np.empty(0, dtype=meta['dtype'])
+        return list(meta['dates']), series
+
+    def delete(self, aoi, index="ndvi"):
+        shutil.rmtree(self._cube_dir(aoi, index), ignore_errors=True)
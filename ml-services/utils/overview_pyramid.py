@@ -0,0 +1,187 @@
+import os
+import hashlib
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils.cloud_detector import CloudDetector
+
+
+class OverviewPyramid:
+    """
+    Low-resolution levels built once at ingest
+    Cloud screening, the Gemini quick path and visualizations only need small
+    views; they read the smallest level that is big enough instead of decoding
+    and shrinking the full-resolution upload every time
+
+    GeoTIFFs get internal overviews (GDAL, average resampling). Their levels are
+    returned like the other uploads' levels, as 8 bit RGB: `bands` picks the red,
+    green and blue bands and `max_value` gives the full scale of >8 bit data
+    (e.g. bands=(4, 3, 2), max_value=10000 for a B2/B3/B4/B8 Sentinel-2 L2A
+    stack). Files that cannot be mapped to RGB that way have no usable level.
+    JPEG/PNG uploads get downsampled PNG copies in a sidecar folder named after
+    the upload's content hash, so two uploads with the same file name (or a
+    re-upload under an old name) never share levels:
+        <cache_dir or upload folder>/<sha256>.overviews/x4.png
+    """
+
+    GEOTIFF_EXTENSIONS = ('.tif', '.tiff')
+
+    def __init__(self, factors=(2, 4, 8, 16), cache_dir=None, bands=None, max_value=None):
+        """
+        Initialize overview pyramid
+
+        Args:
+            factors (tuple): Downscale factors to build
+            cache_dir (str): Where sidecar levels go (default: next to the upload)
+            bands (tuple): 1-based red, green, blue bands of GeoTIFF uploads
+                           (default: bands 1-3 of 3-band files, others are refused)
+            max_value: Full scale of GeoTIFF data wider than 8 bit, see CloudDetector.scene_scale
+        """
+        self.factors = tuple(sorted(factors))
+        self.cache_dir = cache_dir
+        self.bands = tuple(bands) if bands is not None else None
+        self.max_value = max_value
+        # (path, mtime, size) -> content hash, so a file is hashed once per process
+        self._digests = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        print(f"OverviewPyramid initialized with factors: {self.factors}")
+
+    def _is_geotiff(self, image_path):
+        return image_path.lower().endswith(self.GEOTIFF_EXTENSIONS)
+
+    def _content_hash(self, image_path):
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in self._digests:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self._digests[key] = digest.hexdigest()
+        return self._digests[key]
+
+    def _sidecar_dir(self, image_path):
+        folder = self.cache_dir or os.path.dirname(os.path.abspath(image_path))
+        return os.path.join(folder, self._content_hash(image_path) + '.overviews')
+
+    def _sidecar_path(self, image_path, factor):
+        return os.path.join(self._sidecar_dir(image_path), f"x{factor}.png")
+
+    def build(self, image_path):
+        """
+        Build all levels for one upload (call once at ingest)
+
+        Returns:
+            list: Factors that were built
+        """
+        print(f"Building overviews for: {image_path}")
+        try:
+            if self._is_geotiff(image_path):
+                import rasterio
+                from rasterio.enums import Resampling
+
+                with rasterio.open(image_path, 'r+') as src:
+                    factors = [f for f in self.factors if min(src.width, src.height) // f >= 1]
+                    src.build_overviews(factors, Resampling.average)
+                    src.update_tags(ns='rio_overview', resampling='average')
+            else:
+                img = np.array(Image.open(image_path).convert('RGB'))
+                height, width = img.shape[:2]
+                os.makedirs(self._sidecar_dir(image_path), exist_ok=True)
+                factors = []
+                for factor in self.factors:
+                    size = (width // factor, height // factor)
+                    if min(size) < 1:
+                        break
+                    # each level from the full image with area averaging
+                    level = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+                    Image.fromarray(level).save(self._sidecar_path(image_path, factor))
+                    factors.append(factor)
+
+            print(f"   Overview levels built: {factors}")
+            return factors
+
+        except Exception as e:
+            print(f"Error building overviews: {e}")
+            return []
+
+    def _rgb_bands(self, src):
+        """Bands of an open GeoTIFF to read as R, G, B (ValueError if there is no RGB mapping)"""
+        if self.bands is not None:
+            if len(self.bands) != 3 or not set(self.bands) <= set(src.indexes):
+                raise ValueError(f"bands {self.bands} are not 3 bands of {src.name} ({src.count} bands)")
+            return self.bands
+        if src.count != 3:
+            raise ValueError(f"{src.name} has {src.count} bands, set bands to pick red, green and blue")
+        return src.indexes
+
+    def _available_factors(self, image_path):
+        if self._is_geotiff(image_path):
+            import rasterio
+            with rasterio.open(image_path) as src:
+                bands = self._rgb_bands(src)
+                if src.dtypes[bands[0] - 1] not in ('uint8', 'float32', 'float64') and self.max_value is None:
+                    raise ValueError(f"{src.dtypes[bands[0] - 1]} data needs max_value to be shown as 8 bit RGB")
+                return src.overviews(bands[0]), (src.width, src.height)
+        factors = [f for f in self.factors if os.path.exists(self._sidecar_path(image_path, f))]
+        if not factors:
+            return [], None
+        with Image.open(image_path) as img:
+            return factors, img.size
+
+    def level_factor(self, image_path, min_size):
+        """
+        Factor of the level load() would return, None if no built level fits
+        (callers use it to tell overview pixels apart in their own caches)
+        """
+        try:
+            factors, size = self._available_factors(image_path)
+            fitting = [f for f in factors if min(size) // f >= min_size]
+            return max(fitting) if fitting else None
+        except Exception as e:
+            print(f"Error checking overviews: {e}")
+            return None
+
+    def load(self, image_path, min_size):
+        """
+        Smallest built level whose shorter side is still >= min_size
+
+        Args:
+            image_path (str): Original upload
+            min_size (int): Resolution the caller needs
+
+        Returns:
+            numpy.ndarray or None: (H, W, 3) uint8 RGB level, None if no level fits
+                                   (caller should read the full image)
+        """
+        try:
+            factor = self.level_factor(image_path, min_size)
+            if factor is None:
+                return None
+
+            if self._is_geotiff(image_path):
+                import rasterio
+                with rasterio.open(image_path) as src:
+                    bands = self._rgb_bands(src)
+                    # GDAL serves this from the matching internal overview
+                    data = src.read(list(bands), out_shape=(len(bands), src.height // factor, src.width // factor))
+                level = np.moveaxis(data, 0, -1)
+                # the level covers the whole scene, so it can decide a float scene's range itself
+                level = CloudDetector.to_byte_range(level, CloudDetector.scene_scale(level, self.max_value))
+                if level.dtype != np.uint8:
+                    # float data that was already 0-255
+                    level = np.clip(level, 0, 255).astype(np.uint8)
+            else:
+                level = np.array(Image.open(self._sidecar_path(image_path, factor)).convert('RGB'))
+
+            print(f"Overview x{factor} used: {level.shape[1]}x{level.shape[0]}")
+            return level
+
+        except Exception as e:
+            print(f"Error loading overview: {e}")
+            return None
@@ -0,0 +1,133 @@
+import os
+import hashlib
+import numpy as np
+
+
+class PreprocessCache:
+    """
+    On-disk cache of preprocessed images
+    Keyed by file content (not path), so the same upload is decoded and resized once
+    no matter how many times the quick path, detailed path or change detection ask for it
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        """
+        Initialize cache
+
+        Args:
+            cache_dir (str): Folder for the cached .npy files (created if missing)
+            max_bytes (int): Size budget, least recently used entries are evicted above it
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        print(f"PreprocessCache initialized")
+        print(f"   Folder: {cache_dir}")
+        print(f"   Budget: {max_bytes / 1024 / 1024:.0f} MB")
+
+    def make_key(self, image_path, target_size, dtype, variant=""):
+        """
+        Build cache key from file content hash + preprocessing settings
+
+        Args:
+            image_path (str): Source image
+            target_size (int): Output size
+            dtype: Output dtype
+            variant (str): Anything else that changes the output (e.g. decode mode)
+
+        Returns:
+            str: Key usable as a file name
+        """
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        key = f"{digest.hexdigest()}_{target_size}_{np.dtype(dtype).str.lstrip('<>|=')}"
+        if variant:
+            key += f"_{variant}"
+        return key
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npy')
+
+    def get(self, key):
+        """
+        Look up a cached array
+
+        Returns:
+            numpy.memmap or None: Read-only memory-mapped array, None on a miss
+        """
+        path = self._path(key)
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        # mark as recently used for LRU eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return array
+
+    def put(self, key, array):
+        """
+        Store an array, then evict old entries if over budget
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            # atomic, so a reader never sees half a file
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npy'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # already gone, or still mapped by another process on Windows
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            print(f"PreprocessCache evicted {removed} entries ({total / 1024 / 1024:.1f} MB left)")
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.remove(path)
+        self.hits = 0
+        self.misses = 0
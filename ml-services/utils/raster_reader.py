@@ -0,0 +1,225 @@
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+
+class RasterBlock:
+    """
+    One fixed-size piece of a larger raster
+
+    Attributes:
+        data (numpy.ndarray): Pixels as (height, width, bands), same layout the other utils expect
+        window (rasterio.windows.Window): Where the block sits in the full scene
+        transform (affine.Affine): Georeference of the block's top-left pixel
+        crs: Coordinate reference system of the scene
+        row, col (int): Block index in the block grid
+    """
+
+    def __init__(self, data, window, transform, crs, row, col):
+        self.data = data
+        self.window = window
+        self.transform = transform
+        self.crs = crs
+        self.row = row
+        self.col = col
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def __repr__(self):
+        return (f"RasterBlock(row={self.row}, col={self.col}, "
+                f"offset=({self.window.row_off}, {self.window.col_off}), shape={self.data.shape})")
+
+
+class RasterReader:
+    """
+    Windowed GeoTIFF reader
+    Reads a scene block by block so memory stays bounded no matter how big the file is
+    (a single Sentinel-2 tile is 10980x10980 per band)
+    """
+
+    def __init__(self, image_path, block_size=1024, bands=None):
+        """
+        Open a raster for windowed reading
+
+        Args:
+            image_path (str): Path to GeoTIFF (or any file GDAL can open)
+            block_size (int): Height and width of each block in pixels
+            bands (tuple): 1-based band indexes to read, in output channel order
+                           e.g. (3, 2, 1) turns an RGB GeoTIFF into the BGR layout
+                           used by CloudDetector / ChangeDetector. None = all bands
+        """
+        self.image_path = image_path
+        self.block_size = block_size
+        self.dataset = rasterio.open(image_path)
+        self.bands = tuple(bands) if bands is not None else tuple(self.dataset.indexes)
+
+        print(f"RasterReader opened: {image_path}")
+        print(f"   Size: {self.width}x{self.height}, bands: {self.bands}, block size: {block_size}")
+
+    @property
+    def width(self):
+        return self.dataset.width
+
+    @property
+    def height(self):
+        return self.dataset.height
+
+    @property
+    def crs(self):
+        return self.dataset.crs
+
+    @property
+    def transform(self):
+        return self.dataset.transform
+
+    @property
+    def profile(self):
+        return self.dataset.profile
+
+    @property
+    def block_grid(self):
+        """Number of (rows, cols) of blocks covering the scene"""
+        rows = (self.height + self.block_size - 1) // self.block_size
+        cols = (self.width + self.block_size - 1) // self.block_size
+        return rows, cols
+
+    def windows(self):
+        """
+        Yield (row, col, window) for every block, left to right, top to bottom
+        Edge blocks are clipped to the scene, so they can be smaller than block_size
+        """
+        rows, cols = self.block_grid
+        for row in range(rows):
+            row_off = row * self.block_size
+            height = min(self.block_size, self.height - row_off)
+            for col in range(cols):
+                col_off = col * self.block_size
+                width = min(self.block_size, self.width - col_off)
+                yield row, col, Window(col_off, row_off, width, height)
+
+    def read_window(self, window):
+        """
+        Read one window as (height, width, bands)
+
+        Args:
+            window (rasterio.windows.Window): Area to read
+
+        Returns:
+            numpy.ndarray: Pixel data in the raster's native dtype
+        """
+        data = self.dataset.read(self.bands, window=window)
+        # rasterio gives (bands, h, w); the utils work on (h, w, bands)
+        return np.moveaxis(data, 0, -1)
+
+    def read_overview(self, max_side=1024):
+        """
+        Decimated read of the whole scene as (height, width, bands), longest side <= max_side
+        Served from the file's overviews when it has them; used to decide per-scene
+        things (e.g. value range) without a full pass
+        """
+        step = max(1, int(np.ceil(max(self.width, self.height) / max_side)))
+        data = self.dataset.read(
+            list(self.bands),
+            out_shape=(len(self.bands), max(1, self.height // step), max(1, self.width // step))
+        )
+        return np.moveaxis(data, 0, -1)
+
+    def iter_blocks(self):
+        """
+        Yield RasterBlock objects covering the whole scene
+        Only one block is held in memory at a time
+        """
+        for row, col, window in self.windows():
+            yield RasterBlock(
+                data=self.read_window(window),
+                window=window,
+                transform=self.dataset.window_transform(window),
+                crs=self.crs,
+                row=row,
+                col=col
+            )
+
+    def map_blocks(self, func):
+        """
+        Run func on every block and yield (block, result)
+        Lets any util that works on a numpy image (CloudDetector, SpectralIndices,
+        ChangeDetector) be applied to a whole scene piece by piece
+
+        Args:
+            func (callable): Takes a (h, w, bands) array, returns anything
+        """
+        for block in self.iter_blocks():
+            yield block, func(block.data)
+
+    def close(self):
+        self.dataset.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BlockStats:
+    """
+    Running statistics for values that arrive block by block
+    min / max / mean / std / histogram without ever holding the full raster
+    """
+
+    def __init__(self, bins=100, value_range=(-1.0, 1.0)):
+        self.bins = bins
+        self.value_range = value_range
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.bin_edges = np.linspace(value_range[0], value_range[1], bins + 1)
+
+    def update(self, values):
+        """Add one block of values (any shape, NaN ignored)"""
+        values = values[np.isfinite(values)] if values.dtype.kind == 'f' else values.ravel()
+        if values.size == 0:
+            return
+        self.count += int(values.size)
+        self.total += float(values.sum(dtype=np.float64))
+        self.total_squares += float(np.square(values, dtype=np.float64).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.histogram += np.histogram(values, bins=self.bin_edges)[0]
+
+    def merge(self, other):
+        """Combine with stats computed on other blocks (e.g. in another worker)"""
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram += other.histogram
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float('nan')
+
+    @property
+    def std(self):
+        if not self.count:
+            return float('nan')
+        variance = self.total_squares / self.count - self.mean ** 2
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "std": self.std,
+            "histogram": self.histogram.tolist(),
+            "bin_edges": self.bin_edges.tolist()
+        }
@@ -0,0 +1,28 @@
+from statistics import NormalDist
+
+import numpy as np
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """
+    Wilson score interval for a proportion estimated from a sample
+
+    Behaves well near 0% and 100% (unlike the plain normal approximation),
+    which matters for cloud / change fractions that are often tiny.
+
+    Args:
+        successes (int): Sampled pixels that matched (cloudy, changed, ...)
+        trials (int): Pixels sampled
+        confidence (float): Confidence level, e.g. 0.95
+
+    Returns:
+        tuple: (low, high) proportions in [0, 1]
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (p + z ** 2 / (2 * trials)) / denominator
+    half_width = z * float(np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2))) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
@@ -1,9 +1,28 @@
 import numpy as np
 import cv2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 class SpectralIndices:
     # RGB images --> simulate bands
     #real stat data (GeoTIFF)--> use actual bands
+
+    # every index here is a normalized difference (A - B) / (A + B)
+    # where A and B are sums of one or more bands
+    INDEX_FORMULAS = {
+        "ndvi": (("nir",), ("red",)),             # vegetation
+        "ndwi": (("green",), ("nir",)),           # open water
+        "mndwi": (("green",), ("swir1",)),        # water, less built-up noise
+        "ndbi": (("swir1",), ("nir",)),           # built-up area
+        "bsi": (("swir1", "red"), ("nir", "blue")),  # bare soil
+    }
+
+    # pixels per chunk in the batch functions (~4 MB per float32 band)
+    BATCH_CHUNK_PIXELS = 1024 * 1024
+
+    # band positions (1-based) in a 4-band B2, B3, B4, B8 GeoTIFF (Sentinel-2 order)
+    DEFAULT_BAND_MAP = {"blue": 1, "green": 2, "red": 3, "nir": 4}
+
     def __init__(self):
         print("Spectral Indices Utility Initialized")
         
@@ -99,6 +118,262 @@ class SpectralIndices:
             print(f" Error calculating NDWI: {str(e)}")
             return None
     
+    def calculate_indices(self, bands, indices=("ndvi", "ndwi"), band_order=None):
+        """
+        Compute several indices in one pass over the bands
+
+        Each band is converted to float32 once and band sums (numerators and
+        denominators) are shared between indices, so asking for more indices
+        costs only the final divide per index.
+
+        Args:
+            bands: dict of band name -> 2D array ("blue", "green", "red", "nir", "swir1"),
+                   or a (H, W, C) array together with band_order
+            indices (iterable): Names from INDEX_FORMULAS
+            band_order (tuple): Band name of each channel when bands is an array,
+                                e.g. ("blue", "green", "red", "nir")
+
+        Returns:
+            tuple: (index_arrays, stats)
+                - index_arrays: dict of index name -> float32 array in [-1, 1]
+                - stats: dict of index name -> {"min", "max", "mean", "std"}
+        """
+        print(f"\n Calculating indices: {', '.join(indices)}")
+
+        try:
+            index_arrays = self._compute_indices(self._band_dict(bands, band_order), indices)
+            stats = {}
+            for name, index in index_arrays.items():
+                stats[name] = {key: float(value) for key, value in self._index_stats(index).items()}
+                print(f"   {name.upper()}: min {stats[name]['min']:.3f}, "
+                      f"max {stats[name]['max']:.3f}, mean {stats[name]['mean']:.3f}")
+            return index_arrays, stats
+
+        except Exception as e:
+            print(f" Error calculating indices: {str(e)}")
+            return None, None
+
+    def calculate_indices_batch(self, band_stack, indices=("ndvi", "ndwi"), band_order=None):
+        """
+        calculate_indices for a whole stack of scenes (or dates) at once
+
+        Args:
+            band_stack: (N, H, W, C) array with band_order, or dict of band name -> (N, H, W)
+            indices (iterable): Names from INDEX_FORMULAS
+            band_order (tuple): Band name of each channel
+
+        Returns:
+            tuple: (index_stacks, stats)
+                - index_stacks: dict of index name -> (N, H, W) float32
+                - stats: dict of index name -> {"min", "max", "mean", "std"}, each an (N,) array
+        """
+        print(f"\n Calculating indices for batch: {', '.join(indices)}")
+
+        try:
+            bands = self._band_dict(band_stack, band_order)
+            first_band = next(iter(bands.values()))
+            num_images, height, width = first_band.shape[:3]
+
+            # work through the stack a few images at a time so the float32
+            # temporaries stay cache sized instead of N full-size copies
+            chunk = max(1, self.BATCH_CHUNK_PIXELS // (height * width))
+            index_stacks = {name: np.empty((num_images, height, width), dtype=np.float32) for name in indices}
+            stats = {name: {key: np.empty(num_images, dtype=np.float32) for key in ("min", "max", "mean", "std")}
+                     for name in indices}
+            for start in range(0, num_images, chunk):
+                part = slice(start, start + chunk)
+                results = self._compute_indices({band: arr[part] for band, arr in bands.items()}, indices)
+                for name, index in results.items():
+                    index_stacks[name][part] = index
+                    for key, value in self._index_stats(index, axis=(1, 2)).items():
+                        stats[name][key][part] = value
+            for name in index_stacks:
+                print(f"   {name.upper()}: {len(stats[name]['mean'])} images, "
+                      f"mean of means {stats[name]['mean'].mean():.3f}")
+            return index_stacks, stats
+
+        except Exception as e:
+            print(f" Error calculating batch indices: {str(e)}")
+            return None, None
+
+    def calculate_ndvi_batch(self, images, nir_bands=None):
+        """
+        Vectorized calculate_ndvi over (N, H, W, 3) images, same band handling
+
+        Args:
+            images (numpy.ndarray): (N, H, W, 3) stack
+            nir_bands (numpy.ndarray): Optional (N, H, W) real NIR bands
+
+        Returns:
+            tuple: (ndvi_stack, stats) - (N, H, W) float32 and per-image min/max/mean/std
+        """
+        print(f"Calculating NDVI for {len(images)} images..")
+        if images.ndim != 4 or images.shape[3] != 3:
+            print(" Error calculating NDVI: input must be a (N, H, W, 3) stack")
+            return None, None
+        # same channels calculate_ndvi picks through extract_rgb_bands
+        bands = {"red": images[..., 0], "nir": images[..., 1] if nir_bands is None else nir_bands}
+        ndvi_stacks, stats = self.calculate_indices_batch(bands, indices=("ndvi",))
+        if ndvi_stacks is None:
+            return None, None
+        return ndvi_stacks["ndvi"], stats["ndvi"]
+
+    def calculate_ndwi_batch(self, images):
+        """
+        Vectorized calculate_ndwi over (N, H, W, 3) images, same band handling
+
+        Returns:
+            tuple: (ndwi_stack, stats) - (N, H, W) float32 and per-image min/max/mean/std
+        """
+        print(f"Calculating NDWI for {len(images)} images..")
+        if images.ndim != 4 or images.shape[3] != 3:
+            print(" Error calculating NDWI: input must be a (N, H, W, 3) stack")
+            return None, None
+        # same channels calculate_ndwi picks (NIR approximated like the single version)
+        bands = {"green": images[..., 1], "nir": images[..., 0]}
+        ndwi_stacks, stats = self.calculate_indices_batch(bands, indices=("ndwi",))
+        if ndwi_stacks is None:
+            return None, None
+        return ndwi_stacks["ndwi"], stats["ndwi"]
+
+    def calculate_index_raster(self, src_path, dst_path, index="ndvi", band_map=None,
+                               block_size=1024, num_workers=4, bins=100):
+        """
+        Out-of-core index for full-scene GeoTIFFs
+
+        Reads the scene block by block, computes the index with the real bands
+        (NIR from the file, like calculate_ndvi's nir_band path), writes each block
+        to a float32 GeoTIFF and reduces statistics incrementally. Blocks are
+        computed on a thread pool; memory stays at a few blocks whatever the scene size.
+
+        Args:
+            src_path (str): Multi-band GeoTIFF
+            dst_path (str): Output single-band GeoTIFF
+            index (str): Name from INDEX_FORMULAS ("ndvi", "ndwi", ...)
+            band_map (dict): Band name -> 1-based band index in src (default DEFAULT_BAND_MAP)
+            block_size (int): Block height/width in pixels
+            num_workers (int): Threads computing blocks
+            bins (int): Histogram bins over [-1, 1]
+
+        Returns:
+            dict: count, min, max, mean, std, histogram, bin_edges (None on error)
+        """
+        import rasterio
+        from utils.raster_reader import RasterReader, BlockStats
+
+        print(f"\n Calculating {index.upper()} block by block: {src_path}")
+
+        try:
+            if index not in self.INDEX_FORMULAS:
+                raise ValueError(f"Unknown index: {index}")
+            band_map = band_map or self.DEFAULT_BAND_MAP
+            positive, negative = self.INDEX_FORMULAS[index]
+            band_order = tuple(sorted(set(positive + negative)))
+            missing = [b for b in band_order if b not in band_map]
+            if missing:
+                raise ValueError(f"{index.upper()} needs bands: {', '.join(missing)}")
+
+            stats = BlockStats(bins=bins)
+            max_pending = max(1, num_workers) * 2
+
+            def compute(data):
+                bands = {name: data[..., i] for i, name in enumerate(band_order)}
+                result = self._compute_indices(bands, (index,))[index]
+                block_stats = BlockStats(bins=bins)
+                block_stats.update(result)
+                return result, block_stats
+
+            with RasterReader(src_path, block_size=block_size,
+                              bands=[band_map[b] for b in band_order]) as reader:
+                profile = reader.profile.copy()
+                profile.update(driver='GTiff', count=1, dtype='float32', nodata=None, compress='deflate')
+                if reader.width >= 256 and reader.height >= 256:
+                    profile.update(tiled=True, blockxsize=256, blockysize=256)
+                else:
+                    profile.update(tiled=False)
+                    profile.pop('blockxsize', None)
+                    profile.pop('blockysize', None)
+
+                with rasterio.open(dst_path, 'w', **profile) as dst, \
+                        ThreadPoolExecutor(max_workers=max(1, num_workers)) as pool:
+                    pending = deque()
+
+                    def write_oldest():
+                        window, future = pending.popleft()
+                        result, block_stats = future.result()
+                        dst.write(result, 1, window=window)
+                        stats.merge(block_stats)
+
+                    for block in reader.iter_blocks():
+                        pending.append((block.window, pool.submit(compute, block.data)))
+                        # bound the blocks in flight so memory stays constant
+                        if len(pending) >= max_pending:
+                            write_oldest()
+                    while pending:
+                        write_oldest()
+
+            summary = stats.as_dict()
+            print(f"   {index.upper()} Stats: min {summary['min']:.3f}, max {summary['max']:.3f}, "
+                  f"mean {summary['mean']:.3f}")
+            print(f"   Saved to {dst_path}")
+            return summary
+
+        except Exception as e:
+            print(f" Error calculating {index.upper()} raster: {str(e)}")
+            return None
+
+    def _band_dict(self, bands, band_order):
+        if isinstance(bands, dict):
+            return bands
+        if band_order is None or len(band_order) != bands.shape[-1]:
+            raise ValueError("band_order must name every channel of the band stack")
+        return {name: bands[..., i] for i, name in enumerate(band_order)}
+
+    def _index_stats(self, index, axis=None):
+        return {
+            "min": index.min(axis=axis),
+            "max": index.max(axis=axis),
+            "mean": index.mean(axis=axis),
+            "std": index.std(axis=axis)
+        }
+
+    def _compute_indices(self, raw_bands, indices):
+        # shared core of the index engine, works on any shape of band arrays
+        for name in indices:
+            if name not in self.INDEX_FORMULAS:
+                raise ValueError(f"Unknown index: {name}")
+            positive, negative = self.INDEX_FORMULAS[name]
+            missing = [b for b in positive + negative if b not in raw_bands]
+            if missing:
+                raise ValueError(f"{name.upper()} needs bands: {', '.join(missing)}")
+
+        float_bands = {}
+        band_sums = {}
+        epsilon = 1e-10
+
+        def band_sum(names):
+            # sum of bands, cached so shared terms are computed once
+            key = tuple(sorted(names))
+            if key not in band_sums:
+                for band in key:
+                    if band not in float_bands:
+                        float_bands[band] = raw_bands[band].astype(np.float32)
+                total = float_bands[key[0]]
+                for band in key[1:]:
+                    total = total + float_bands[band]
+                band_sums[key] = total
+            return band_sums[key]
+
+        index_arrays = {}
+        for name in indices:
+            positive, negative = self.INDEX_FORMULAS[name]
+            numerator = band_sum(positive) - band_sum(negative)
+            denominator = band_sum(positive + negative)
+            index = np.divide(numerator, denominator + epsilon, out=numerator)
+            np.clip(index, -1, 1, out=index)
+            index_arrays[name] = index
+        return index_arrays
+
     def visualize_index(self,index_array,output_path,index_name="Index",colormap=cv2.COLORMAP_JET):
         try:
             ## NDVI/NDWI range: -1 to +1